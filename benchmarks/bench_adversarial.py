@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Check that parsing time grows linearly with the length of hostile input.
+
+Parses every adversarial input of corpus.py at increasing lengths and prints
+the time per character, which should stay flat. Run from the repository root:
+
+    $ python benchmarks/bench_adversarial.py
+"""
+from __future__ import unicode_literals, print_function
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ttp import ttp  # noqa: E402
+from corpus import ADVERSARIAL  # noqa: E402
+
+SIZES = [250, 1000, 4000, 16000, 64000]
+
+
+def ns_per_char(parser, text, repeat=3):
+    seconds = min(timeit.repeat(lambda: parser.parse(text, html=False), number=1, repeat=repeat))
+    return seconds / len(text) * 1e9
+
+
+def main():
+    parser = ttp.Parser()
+    print('%-18s' % 'ns/char' + ''.join('%10d' % size for size in SIZES))
+    for name, build in ADVERSARIAL:
+        print('%-18s' % name + ''.join('%10.1f' % ns_per_char(parser, build(size))
+                                       for size in SIZES))
+
+
+if __name__ == '__main__':
+    main()
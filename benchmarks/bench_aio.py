@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure how long a burst of Tweets blocks the event loop.
+
+A ticker task measures its largest delay while a burst is parsed inline with
+Parser.parse and with aio.parse_stream in threads and in processes. Run from
+the repository root:
+
+    $ python benchmarks/bench_aio.py
+"""
+from __future__ import unicode_literals, print_function
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ttp import aio, ttp  # noqa: E402
+import corpus  # noqa: E402
+
+TICK = 0.001
+
+
+async def ticker(delays):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        delays.append(time.perf_counter() - start - TICK)
+
+
+async def source(texts):
+    for i, text in enumerate(texts):
+        if i % 100 == 0:
+            await asyncio.sleep(0)  # like a socket that has data waiting
+
+        yield text
+
+
+async def inline(texts, executor):
+    parser = ttp.Parser()
+    async for text in source(texts):
+        parser.parse(text)
+
+
+async def stream(texts, executor):
+    async for result in aio.parse_stream(source(texts), executor, chunk_size=200):
+        pass
+
+
+async def measure(run, texts, executor=None):
+    delays = []
+    tick = asyncio.ensure_future(ticker(delays))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await run(texts, executor)
+    seconds = time.perf_counter() - start
+    await asyncio.sleep(0.01)
+    tick.cancel()
+    return seconds, max(delays)
+
+
+def main(count=20000):
+    texts = corpus.generate('mixed', count)
+    with ProcessPoolExecutor(os.cpu_count()) as executor:
+        for name, run, pool in [('inline Parser.parse', inline, None),
+                                ('parse_stream, threads', stream, None),
+                                ('parse_stream, processes', stream, executor)]:
+            seconds, stall = asyncio.run(measure(run, texts, pool))
+            print('%-24s %8.0f tweets/s  longest stall %7.1f ms'
+                  % (name, count / seconds, stall * 1000))
+
+
+if __name__ == '__main__':
+    main()
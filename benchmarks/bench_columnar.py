@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare building entity columns from ParseResults with parse_columns.
+
+Run from the repository root:
+
+    $ python benchmarks/bench_columnar.py
+"""
+from __future__ import unicode_literals, print_function
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ttp import ttp, columnar  # noqa: E402
+import corpus  # noqa: E402
+
+
+def from_results(texts):
+    """Regroup the per-Tweet lists of ParseResults into columns."""
+    parser = ttp.Parser(include_spans=True)
+    kinds, docs, starts, ends, names = [], [], [], [], []
+    for doc, text in enumerate(texts):
+        result = parser.parse(text, html=False)
+        for kind, entities in (('url', result.urls), ('user', result.users),
+                               ('list', result.lists), ('tag', result.tags)):
+            for entity in entities:
+                kinds.append(kind)
+                docs.append(doc)
+                starts.append(entity[-1][0])
+                ends.append(entity[-1][1])
+                names.append(entity[0] if kind != 'list' else '/'.join(entity[:2]))
+
+    return kinds, docs, starts, ends, names
+
+
+def main(count=5000):
+    texts = corpus.generate('mixed', count)
+    old = min(timeit.repeat(lambda: from_results(texts), number=1, repeat=5))
+    new = min(timeit.repeat(lambda: columnar.parse_columns(texts), number=1, repeat=5))
+    print('ParseResults to lists  %6.2f us/tweet' % (old / count * 1e6))
+    print('parse_columns          %6.2f us/tweet  speedup %.2fx' % (new / count * 1e6, old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Micro-benchmark the HTML formatting of URL-heavy and hashtag-heavy Tweets.
+
+Compares the escaping and hashtag quoting of the old parser with the current
+ones, the cost of HTML on top of parsing, and custom HTML from overridden
+format_* methods with the same HTML from templates. Run from the repository
+root:
+
+    $ python benchmarks/bench_formatting.py
+"""
+from __future__ import unicode_literals, print_function
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ttp import ttp  # noqa: E402
+import corpus  # noqa: E402
+import legacy  # noqa: E402
+
+
+class NofollowParser(ttp.Parser):
+    """Custom HTML the old way, by overriding the format_* methods"""
+
+    def format_tag(self, tag, text):
+        return '<a href="/hashtag/%s" rel="nofollow">%s%s</a>' % (ttp.quote_hashtag(text), tag, text)
+
+    def format_username(self, at_char, user):
+        return '<a href="/%s" rel="nofollow">%s%s</a>' % (user, at_char, user)
+
+    def format_list(self, at_char, user, list_name):
+        return '<a href="/%s/lists/%s" rel="nofollow">%s%s/%s</a>' % (user, list_name, at_char, user, list_name)
+
+    def format_url(self, url, text):
+        return '<a href="%s" rel="nofollow">%s</a>' % (ttp.escape(url), text)
+
+
+NOFOLLOW_TEMPLATES = {
+    'tag': '<a href="/hashtag/{quoted}" rel="nofollow">{hash}{tag}</a>',
+    'user': '<a href="/{user}" rel="nofollow">{at}{user}</a>',
+    'list': '<a href="/{user}/lists/{list_name}" rel="nofollow">{at}{user}/{list_name}</a>',
+    'url': '<a href="{url}" rel="nofollow">{text}</a>',
+}
+
+
+def best(func, repeat=5):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main(count=3000):
+    url_tweets = corpus.generate('url', count)
+    tag_tweets = corpus.generate('hashtag', count)
+    parser = ttp.Parser()
+    old_parser = legacy.Parser()
+    urls = [url for tweet in url_tweets for url in parser.parse(tweet, html=False).urls]
+    tags = [tag for tweet in tag_tweets for tag in parser.parse(tweet, html=False).tags]
+
+    def old_quote():
+        for tag in tags:
+            legacy.quote(('#' + tag).encode('utf-8'))
+
+    def new_quote():
+        for tag in tags:
+            ttp.quote_hashtag(tag)
+
+    rows = [
+        ('escape, per URL', len(urls),
+         best(lambda: [legacy.escape(url) for url in urls]),
+         best(lambda: [ttp.escape(url) for url in urls])),
+        ('quote hashtag, per tag', len(tags), best(old_quote), best(new_quote)),
+    ]
+    for name, tweets in (('url', url_tweets), ('hashtag', tag_tweets)):
+        for html in (True, False):
+            rows.append(('parse %s html=%s, per Tweet' % (name, html), count,
+                         best(lambda: [old_parser.parse(tweet, html) for tweet in tweets]),
+                         best(lambda: [parser.parse(tweet, html) for tweet in tweets])))
+
+    mixed = corpus.generate('mixed', count)
+    overrides = NofollowParser()
+    templates = ttp.Parser(templates=NOFOLLOW_TEMPLATES)
+    rows.append(('format_* overrides vs templates', count,
+                 best(lambda: [overrides.parse(tweet) for tweet in mixed]),
+                 best(lambda: [templates.parse(tweet) for tweet in mixed])))
+
+    for name, number, old, new in rows:
+        print('%-36s  old %7.3f us  new %7.3f us  speedup %.2fx'
+              % (name, old / number * 1e6, new / number * 1e6, old / new))
+
+
+if __name__ == '__main__':
+    main()
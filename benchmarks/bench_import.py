@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure the start up cost of ttp in fresh interpreters.
+
+For each way of compiling the patterns it times importing ttp.ttp, and
+importing it, creating a Parser and parsing a first Tweet:
+- lazy: the patterns are compiled when first used
+- eager: all patterns are compiled right after the import, with
+  ttp.compile_patterns()
+
+The import is also broken down with python -X importtime. The package is
+byte-compiled first, as it is when installed. Run from the repository root:
+
+    $ python benchmarks/bench_import.py
+"""
+from __future__ import unicode_literals, print_function
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+TWEET = '@burnettedmond check #python at http://example.com/path @user/list'
+
+# Prints the seconds taken by the import, and by the rest of the setup and
+# the first parse
+CHILD = '''
+import time
+start = time.perf_counter()
+from ttp import ttp
+imported = time.perf_counter()
+%s
+ttp.Parser().parse(%r)
+print(imported - start, time.perf_counter() - imported)
+'''
+MODES = [
+    ('lazy', ''),
+    ('eager', 'ttp.compile_patterns()'),
+]
+
+
+def run(*args):
+    return subprocess.check_output((sys.executable,) + args, cwd=ROOT,
+                                   stderr=subprocess.STDOUT)
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def main(repeat=21):
+    run('-m', 'compileall', '-q', 'ttp')
+    print('%-7s %10s %16s' % ('mode', 'import', 'first parse'))
+    for name, setup in MODES:
+        times = [tuple(map(float, run('-c', CHILD % (setup, TWEET)).split()))
+                 for i in range(repeat)]
+        imported = median([time for time, rest in times])
+        parsed = median([time + rest for time, rest in times])
+        print('%-7s %8.2f ms %14.2f ms' % (name, imported * 1e3,
+                                            parsed * 1e3))
+
+    print()
+    output = run('-X', 'importtime', '-c', 'import ttp.ttp')
+    for line in output.decode().splitlines()[-3:]:
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare Parser.parse against Parser.parse_incremental while typing.
+
+A text of the given length is typed one character at a time, and then a
+character is inserted in the middle of it, the time is per keystroke. Run
+from the repository root:
+
+    $ python benchmarks/bench_incremental.py
+"""
+from __future__ import unicode_literals, print_function
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ttp import ttp  # noqa: E402
+import corpus  # noqa: E402
+
+LENGTHS = [280, 1000, 4000]
+
+
+def main(repeat=3):
+    parser = ttp.Parser()
+    for length in LENGTHS:
+        text = ' '.join(corpus.generate('mixed', length // 50 + 1))[:length]
+
+        def typing_parse():
+            for end in range(1, len(text) + 1):
+                parser.parse(text[:end])
+
+        def typing_incremental():
+            composed = parser.parse_incremental()
+            for char in text:
+                composed.append(char)
+
+        def editing_parse():
+            for i in range(100):
+                parser.parse(text[:length // 2] + 'x' + text[length // 2:])
+
+        def editing_incremental():
+            composed = parser.parse_incremental(text)
+            for i in range(100):
+                composed.edit(length // 2, 0, 'x')
+
+        for name, old, new, keystrokes in (
+                ('typing', typing_parse, typing_incremental, len(text)),
+                ('editing', editing_parse, editing_incremental, 100)):
+            old = min(timeit.repeat(old, number=1, repeat=repeat))
+            new = min(timeit.repeat(new, number=1, repeat=repeat))
+            print('%5d chars %-8s parse %8.2f us  incremental %7.2f us  '
+                  'speedup %.2fx' % (length, name, old / keystrokes * 1e6,
+                                     new / keystrokes * 1e6, old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare Parser.parse against Parser.parse_lazy reading a single attribute.
+
+Run from the repository root:
+
+    $ python benchmarks/bench_lazy.py
+"""
+from __future__ import unicode_literals, print_function
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ttp import ttp  # noqa: E402
+import corpus  # noqa: E402
+
+KINDS = ['url', 'hashtag', 'mention', 'mixed']
+ATTRIBUTES = ['tags', 'urls', 'users', 'reply']
+
+
+def main(count=1000, repeat=5):
+    parser = ttp.Parser()
+    for kind in KINDS:
+        texts = corpus.generate(kind, count)
+        for attribute in ATTRIBUTES:
+            def eager():
+                for text in texts:
+                    getattr(parser.parse(text, html=False), attribute)
+
+            def lazy():
+                for text in texts:
+                    getattr(parser.parse_lazy(text, html=False), attribute)
+
+            old = min(timeit.repeat(eager, number=1, repeat=repeat))
+            new = min(timeit.repeat(lazy, number=1, repeat=repeat))
+            print('%-8s %-6s  parse %7.2f us  parse_lazy %7.2f us  speedup %.2fx'
+                  % (kind, attribute, old / count * 1e6, new / count * 1e6,
+                     old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure the memory held by ParseResults, old parser against the current one.
+
+Run from the repository root:
+
+    $ python benchmarks/bench_memory.py
+"""
+from __future__ import unicode_literals, print_function
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ttp import ttp  # noqa: E402
+import legacy  # noqa: E402
+from bench_single_pass import TWEETS  # noqa: E402
+
+
+def bytes_per_result(parser, number):
+    texts = TWEETS * (number // len(TWEETS))
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = [parser.parse(text, html=False) for text in texts]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / float(len(results))
+
+
+def main(number=8000):
+    for include_spans in (False, True):
+        old = bytes_per_result(legacy.Parser(include_spans=include_spans), number)
+        new = bytes_per_result(ttp.Parser(include_spans=include_spans), number)
+        print('include_spans=%-5s  old %6.0f bytes/result  new %6.0f bytes/result  '
+              'saving %.0f%%' % (include_spans, old, new, 100 - new / old * 100))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure how parallel.parse_all scales with the number of workers.
+
+Run from the repository root:
+
+    $ python benchmarks/bench_parallel.py [max_workers]
+"""
+from __future__ import unicode_literals, print_function
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ttp import parallel, ttp  # noqa: E402
+from bench_single_pass import TWEETS  # noqa: E402
+
+
+def main(max_workers=None):
+    max_workers = max_workers or os.cpu_count() or 1
+    texts = TWEETS * 25000
+    start = time.time()
+    for result in ttp.Parser().parse_many(texts):
+        pass
+
+    serial = time.time() - start
+    print('%-10s %9.0f tweets/s' % ('serial', len(texts) / serial))
+
+    workers = 1
+    while workers <= max_workers:
+        start = time.time()
+        for result in parallel.parse_all(texts, workers=workers):
+            pass
+
+        elapsed = time.time() - start
+        print('%-10s %9.0f tweets/s  %.2fx serial'
+              % ('%d worker%s' % (workers, 's' if workers > 1 else ''),
+                 len(texts) / elapsed, serial / elapsed))
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else None)
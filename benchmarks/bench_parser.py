@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark Parser.parse on the synthetic corpora of corpus.py.
+
+Every corpus is parsed with html=True, html=False and include_spans=True, and
+for only the hashtags or only the URLs. The cost of each entity type, finding
+and formatting it, is measured with a ParseStats. Run from the repository
+root:
+
+    $ python benchmarks/bench_parser.py
+    $ python benchmarks/bench_parser.py --kinds url adversarial --count 500
+
+When pyperf is installed it runs the benchmarks in calibrated worker
+processes and reports the time per Tweet (its usual options such as -o work
+too). Without pyperf it falls back to timeit and prints Tweets per second
+and the cost per entity.
+"""
+from __future__ import unicode_literals, print_function
+import argparse
+import os
+import sys
+import timeit
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ttp import ttp  # noqa: E402
+import corpus  # noqa: E402
+
+try:
+    import pyperf
+except ImportError:
+    pyperf = None
+
+# name: (Parser options, parse options)
+MODES = [
+    ('html', {}, {'html': True}),
+    ('text', {}, {'html': False}),
+    ('spans', {'include_spans': True}, {'html': True}),
+    ('tags', {'entities': {'tags'}}, {'html': False}),
+    ('urls', {'entities': {'urls'}}, {'html': False}),
+]
+ENTITY_TYPES = [('urls', ttp.Url), ('users', ttp.Mention),
+                ('lists', ttp.ListMention), ('tags', ttp.Hashtag)]
+# The ParseStats stages of finding and formatting each entity type
+TYPE_STAGES = [('urls', ('urls', 'format_url')),
+               ('users', ('scan_user', 'format_user')),
+               ('lists', ('scan_list', 'format_list')),
+               ('tags', ('scan_tag', 'format_tag'))]
+
+
+def cases(kinds, count, seed):
+    """Yield a (name, texts, parse) tuple for every corpus and mode."""
+    for kind in kinds:
+        texts = corpus.generate(kind, count, seed)
+        for mode, parser_options, parse_options in MODES:
+            parser = ttp.Parser(**parser_options)
+
+            def parse(texts=texts, parser=parser, options=parse_options):
+                for text in texts:
+                    parser.parse(text, **options)
+
+            yield '%s-%s' % (kind, mode), texts, parse
+
+
+def count_entities(texts):
+    counts = Counter()
+    parser = ttp.Parser()
+    for text in texts:
+        counts.update(type(entity) for entity in parser.parse(text, html=False).entities)
+
+    return [counts[kind] for name, kind in ENTITY_TYPES]
+
+
+def type_costs(texts, repeat):
+    """Return the microseconds per entity of each type, or None for none.
+
+    The fastest of repeat runs is taken for each stage.
+    """
+    best = {}
+    for i in range(repeat):
+        stats = ttp.ParseStats()
+        parser = ttp.Parser(stats=stats)
+        for text in texts:
+            parser.parse(text)
+
+        for stage, totals in stats.as_dict().items():
+            seconds, entities = best.get(stage, (None, 0))
+            if seconds is None or totals['seconds'] < seconds:
+                best[stage] = (totals['seconds'], totals['entities'])
+
+    costs = []
+    for name, stages in TYPE_STAGES:
+        # Finding URLs counts every URL, formatting only those that are kept
+        entities = best.get(stages[1], (0, 0))[1]
+        seconds = sum(best.get(stage, (0, 0))[0] for stage in stages)
+        costs.append(seconds / entities * 1e6 if entities else None)
+
+    return costs
+
+
+def add_arguments(parser):
+    parser.add_argument('--kinds', nargs='+', default=corpus.KINDS, choices=corpus.KINDS)
+    parser.add_argument('--count', type=int, default=1000, help='Tweets per corpus')
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def run_pyperf():
+    runner = pyperf.Runner()
+    add_arguments(runner.argparser)
+    args = runner.parse_args()
+    for name, texts, parse in cases(args.kinds, args.count, args.seed):
+        runner.bench_func(name, parse, inner_loops=len(texts))
+
+
+def run_timeit():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('%-18s %10s %10s %6s %6s %6s %6s %10s' % (
+        'benchmark', 'tweets/s', 'us/tweet', 'urls', 'users', 'lists', 'tags', 'us/entity'))
+    for name, texts, parse in cases(args.kinds, args.count, args.seed):
+        seconds = min(timeit.repeat(parse, number=1, repeat=args.repeat))
+        counts = count_entities(texts)
+        entities = sum(counts) or 1
+        print('%-18s %10.0f %10.2f %6.2f %6.2f %6.2f %6.2f %10.2f' % (
+            (name, len(texts) / seconds, seconds / len(texts) * 1e6)
+            + tuple(count / float(len(texts)) for count in counts)
+            + (seconds / entities * 1e6,)))
+
+    print()
+    print('%-18s %10s %10s %10s %10s' % ('us/entity by type', 'urls', 'users', 'lists', 'tags'))
+    for kind in args.kinds:
+        costs = type_costs(corpus.generate(kind, args.count, args.seed), args.repeat)
+        print('%-18s %s' % (kind, ' '.join('%10.2f' % cost if cost is not None else '%10s' % '-'
+                                           for cost in costs)))
+
+
+if __name__ == '__main__':
+    if pyperf is not None:
+        run_pyperf()
+    else:
+        run_timeit()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare the single-pass Parser against the old four-pass parser.
+
+Run from the repository root:
+
+    $ python benchmarks/bench_single_pass.py
+"""
+from __future__ import unicode_literals, print_function
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ttp import ttp  # noqa: E402
+import legacy  # noqa: E402
+
+TWEETS = [
+    '@burnettedmond, you now support #IvoWertzel\'s tweet parser! https://github.com/edmondburnett/',
+    'Coca-Cola Hits 50 Million Facebook Likes http://bit.ly/QlKOc7',
+    'Follow @CokeZero & Retweet for a chance to win @EASPORTS @EANCAAFootball 13 #GameOn #ad Rules: http://bit.ly/EANCAA',
+    ' #ABillionReasonsToBelieveInAfrica ARISE MAG.FASHION WEEK NY! Tsemaye B,Maki Oh,Tiffany Amber, Ozwald.Showin NY reasons2beliv @CocaCola_NG',
+    'big url: http://blah.com:8080/path/to/here?p=1&q=abc,def#posn2 #ahashtag',
+    'text @username/list-foo and www.foo-bar.com and ＃hashtag　text',
+    'いまなにしてるhttp://example.comいまなにしてる @username',
+    'Just a plain tweet without any entities in it at all, just words.',
+]
+
+
+def bench(parser, html, number):
+    def run():
+        for tweet in TWEETS:
+            parser.parse(tweet, html=html)
+
+    return min(timeit.repeat(run, number=number, repeat=5)) / number / len(TWEETS)
+
+
+def main(number=2000):
+    for html in (True, False):
+        old = bench(legacy.Parser(), html, number)
+        new = bench(ttp.Parser(), html, number)
+        print('html=%-5s  four-pass %6.2f us/tweet  single-pass %6.2f us/tweet  '
+              'speedup %.2fx' % (html, old * 1e6, new * 1e6, old / new))
+
+
+if __name__ == '__main__':
+    main()
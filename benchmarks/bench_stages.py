@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Show where Parser.parse spends its time, stage by stage.
+
+Every corpus is parsed with a ParseStats, which gives the time per Tweet and
+the share of the whole parse for each stage, and without it, to show what
+timing the stages costs. Run from the repository root:
+
+    $ python benchmarks/bench_stages.py
+    $ python benchmarks/bench_stages.py --kinds url mention --count 500
+"""
+from __future__ import unicode_literals, print_function
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ttp import ttp  # noqa: E402
+import corpus  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--kinds', nargs='+', default=corpus.KINDS, choices=corpus.KINDS)
+    parser.add_argument('--count', type=int, default=1000, help='Tweets per corpus')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for kind in args.kinds:
+        texts = corpus.generate(kind, args.count, args.seed)
+        stats = ttp.ParseStats()
+        timed = ttp.Parser(stats=stats)
+        plain = ttp.Parser()
+
+        def parse(parser):
+            for text in texts:
+                parser.parse(text)
+
+        plain_seconds = min(timeit.repeat(lambda: parse(plain), number=1, repeat=args.repeat))
+        timed_seconds = min(timeit.repeat(lambda: parse(timed), number=1, repeat=args.repeat))
+
+        stats.reset()
+        parse(timed)
+        stages = stats.as_dict()
+        total = stages['parse']['seconds']
+        print('%s: %.2f us/tweet, %.2f us/tweet with stats' % (
+            kind, plain_seconds / len(texts) * 1e6, timed_seconds / len(texts) * 1e6))
+        for stage in ttp.STAGES:
+            if stage in stages:
+                print('  %-12s %8.2f us/tweet %6.1f%% %8d calls %8d entities' % (
+                    stage, stages[stage]['seconds'] / len(texts) * 1e6,
+                    stages[stage]['seconds'] / total * 100,
+                    stages[stage]['calls'], stages[stage]['entities']))
+
+
+if __name__ == '__main__':
+    main()
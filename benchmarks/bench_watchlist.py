@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measure matching Tweets against watchlists of growing size.
+
+Every watchlist holds the given number of hashtags, usernames and domains,
+plus the names corpus.py uses, so Tweets do match. The time per Tweet is
+for parsing with the watchlist, and for matching alone. Run from the
+repository root:
+
+    $ python benchmarks/bench_watchlist.py
+    $ python benchmarks/bench_watchlist.py --sizes 1000 1000000
+"""
+from __future__ import unicode_literals, print_function
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ttp import ttp, watchlist  # noqa: E402
+import corpus  # noqa: E402
+
+
+def build(size):
+    tags = dict(('tag%d' % i, i) for i in range(size))
+    users = dict(('user%d' % i, i) for i in range(size))
+    domains = dict(('domain%d.com' % i, i) for i in range(size))
+    tags.update((tag, tag) for tag in corpus.TAGS[::2])
+    users.update((name, name) for name in corpus.NAMES[::2])
+    domains.update((domain.split(':')[0], domain) for domain in corpus.DOMAINS[::2])
+    return watchlist.Watchlist(tags, users, domains)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100, 10000, 100000, 1000000],
+                        help='names of each type in the watchlist')
+    parser.add_argument('--count', type=int, default=1000, help='Tweets')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    texts = corpus.generate('mixed', args.count)
+    entities = [result.entities for result in ttp.Parser().parse_many(texts, False)]
+    print('%10s %10s %12s %12s %10s' % ('size', 'compile s', 'us/tweet', 'match us', 'matches'))
+    for size in args.sizes:
+        start = timeit.default_timer()
+        watched = build(size)
+        compile_seconds = timeit.default_timer() - start
+
+        parser = ttp.Parser(watchlist=watched, entities=watched.fields)
+
+        def parse():
+            for text in texts:
+                parser.parse(text, html=False)
+
+        def match():
+            for records in entities:
+                watched.match(records)
+
+        parse_seconds = min(timeit.repeat(parse, number=1, repeat=args.repeat))
+        match_seconds = min(timeit.repeat(match, number=1, repeat=args.repeat))
+        matches = sum(len(watched.match(records)) for records in entities)
+        print('%10d %10.2f %12.2f %12.2f %10d' % (
+            size, compile_seconds, parse_seconds / len(texts) * 1e6,
+            match_seconds / len(texts) * 1e6, matches))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Generate reproducible synthetic Tweets for the benchmarks.
+
+The same kind, count and seed always give the same Tweets, so timings of
+different versions of the parser can be compared with each other:
+
+    $ python benchmarks/corpus.py url 5
+"""
+from __future__ import unicode_literals, print_function
+import random
+import sys
+
+MAX_LENGTH = 280
+
+WORDS = ['the', 'new', 'release', 'is', 'out', 'check', 'this', 'great',
+         'thread', 'about', 'python', 'parsing', 'tweets', 'today', 'and',
+         'more', 'see', 'you', 'at', 'conference', 'tonight', 'wow', 'lol',
+         'via', 'RT', 'e.g.', 'a/b', 'user@example.com', '3.14', '&amp;']
+CJK_WORDS = ['いまなにしてる', '今日は', '天気', 'がいい', 'ですね', '東京',
+             '新しい', 'ニュース', '見て', 'ください', '中文', '한국어']
+NAMES = ['burnettedmond', 'CocaCola_NG', 'EASPORTS', 'user', 'a', 'x_y_z',
+         'TwitterDev', 'nobody123', 'ivo', 'ianozsvald']
+TAGS = ['ad', 'GameOn', 'python', 'café', 'ÜberTag', 'tag_with_underscores',
+        'abc123', 'x', 'IvoWertzel', 'ABillionReasonsToBelieveInAfrica']
+DOMAINS = ['bit.ly', 'example.com', 'github.com', 't.co', 'foo-bar.co.uk',
+           'x.com', 'blah.com:8080', 'www.example.org', 'bbc.in']
+PATHS = ['', '/', '/QlKOc7', '/path/to/here', '/edmondburnett/',
+         '/test/foo_123.jpg', '/wiki/Foo_(bar)', '/search?q=abc,def#posn2',
+         '/?p=1&q=2', '/a-b-c.html']
+
+
+def _url(rng):
+    scheme = rng.choice(['http://', 'https://', 'https://', ''])
+    domain = rng.choice(DOMAINS)
+    if not scheme and not domain.startswith('www.'):
+        domain = 'www.' + domain
+
+    return scheme + domain + rng.choice(PATHS)
+
+
+def _words(rng, words, count):
+    return [rng.choice(words) for i in range(count)]
+
+
+def _url_heavy(rng):
+    parts = _words(rng, WORDS, rng.randint(2, 6))
+    parts += [_url(rng) for i in range(rng.randint(2, 4))]
+    rng.shuffle(parts)
+    return ' '.join(parts)
+
+
+def _hashtag_heavy(rng):
+    parts = _words(rng, WORDS, rng.randint(2, 6))
+    parts += ['#' + rng.choice(TAGS) for i in range(rng.randint(3, 6))]
+    rng.shuffle(parts)
+    return ' '.join(parts)
+
+
+def _mention_heavy(rng):
+    parts = _words(rng, WORDS, rng.randint(2, 6))
+    parts += ['@' + rng.choice(NAMES) for i in range(rng.randint(2, 5))]
+    parts += ['@%s/%s' % (rng.choice(NAMES), rng.choice(['list', 'my-list', 'team']))
+              for i in range(rng.randint(0, 2))]
+    rng.shuffle(parts)
+    return '@%s %s' % (rng.choice(NAMES), ' '.join(parts))
+
+
+def _cjk(rng):
+    parts = _words(rng, CJK_WORDS, rng.randint(3, 8))
+    parts += ['＠' + rng.choice(NAMES), '＃' + rng.choice(TAGS),
+              '#' + rng.choice(TAGS), _url(rng)]
+    rng.shuffle(parts)
+    return rng.choice(['', ' ', '　']).join(parts)
+
+
+def _mixed(rng):
+    return rng.choice([_url_heavy, _hashtag_heavy, _mention_heavy, _cjk])(rng)
+
+
+# Inputs that made the regexes backtrack, each built for a given length
+ADVERSARIAL = [
+    ('domain-dots', lambda size: 'http://' + 'a.' * (size // 2) + '-'),
+    ('domain-dashes', lambda size: 'http://' + 'a-' * (size // 2)),
+    ('www-dots', lambda size: 'www.' + '.-' * (size // 2)),
+    ('www-runs', lambda size: 'www.1' * (size // 5)),
+    ('query', lambda size: 'http://example.com/?' + 'a=1&' * (size // 4) + '!'),
+    ('path-commas', lambda size: 'http://example.com/' + ',' * size + ' '),
+    ('path-dots', lambda size: 'http://example.com/a' + '.a' * (size // 2)),
+    ('path-parens', lambda size: 'http://example.com/' + '(' * size),
+    ('at-signs', lambda size: '@' * size),
+    ('hash-signs', lambda size: '#' * size),
+    ('at-underscores', lambda size: '@_' * (size // 2)),
+    ('hash-underscores', lambda size: '-#_' * (size // 3)),
+    ('lists', lambda size: '@@a/b' * (size // 5)),
+]
+
+
+def _adversarial(rng):
+    return rng.choice(ADVERSARIAL)[1](rng.randint(100, MAX_LENGTH))
+
+
+GENERATORS = {
+    'url': _url_heavy,
+    'hashtag': _hashtag_heavy,
+    'mention': _mention_heavy,
+    'cjk': _cjk,
+    'mixed': _mixed,
+    'adversarial': _adversarial,
+}
+KINDS = sorted(GENERATORS)
+
+
+def generate(kind, count=1000, seed=42):
+    """Return a list of count Tweets of the given kind."""
+    rng = random.Random('%s-%d' % (kind, seed))
+    generator = GENERATORS[kind]
+    return [generator(rng)[:MAX_LENGTH] for i in range(count)]
+
+
+if __name__ == '__main__':
+    for tweet in generate(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 10):
+        print(tweet)
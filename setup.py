@@ -2,7 +2,7 @@ from setuptools import setup
 
 setup(
     name='twitter-text-python',
-    version='1.1.1',
+    version='2.0.0',
     description='Twitter Tweet parser and formatter',
     long_description="Extract @users, #hashtags and URLs (and unwind shortened links) from tweets including entity locations, also generate HTML for output. Visit https://github.com/edburnett/twitter-text-python for examples.",
     author='Maintained by Edmond Burnett (previously Ian Ozsvald; originally Ivo Wetzel)',
@@ -12,13 +12,25 @@ setup(
     packages=['ttp'],
     include_package_data=True,
     zip_safe=False,
+    python_requires='>=3.7',
     install_requires=[],
+    entry_points={
+        'console_scripts': ['ttp = ttp.cli:main'],
+    },
     classifiers=[
         'Environment :: Console',
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
+        'Programming Language :: Python :: 3.12',
         'Topic :: Software Development :: Libraries :: Python Modules',
         'Topic :: Text Processing :: Linguistic',
     ]
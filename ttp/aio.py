@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Parse Tweets and unwind their shortlinks from asyncio code
+
+    async for result, links in aio.parse_and_follow(tweets):
+        ...
+
+Parsing runs in an executor, so big bursts do not block the event loop, and
+shortlinks are followed with aiohttp (which has to be installed for that).
+"""
+from __future__ import unicode_literals, print_function
+import asyncio
+from collections import defaultdict, deque
+from urllib.parse import urljoin, urlsplit
+
+try:
+    from .ttp import Parser, ParseResult, Url
+    from .parallel import _drop_parser, _parse_chunk, _parser_key
+    from .utils import HEAD_NOT_SUPPORTED, _with_scheme
+except ImportError:  # imported from within ttp/, like tests.py does
+    from ttp import Parser, ParseResult, Url
+    from parallel import _drop_parser, _parse_chunk, _parser_key
+    from utils import HEAD_NOT_SUPPORTED, _with_scheme
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Responses that are followed to their Location, like requests does
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+async def parse_stream(texts, executor=None, chunk_size=100, max_pending=4,
+                       max_delay=0.05, html=True, parser_class=Parser,
+                       **options):
+    """Parse an async iterable of texts and yield a ParseResult for each.
+
+    The texts are parsed in chunks of chunk_size in executor, the default
+    executor of the loop if None, in input order. A chunk is also sent off
+    when the source has not produced a text for max_delay seconds, so a slow
+    stream is not held back. No more texts are read while max_pending
+    chunks are being parsed or the results are not consumed. Extra keyword
+    arguments such as include_spans are passed on to parser_class, which has
+    to be importable by the workers of a ProcessPoolExecutor.
+    """
+    parser_class(**options)  # fail on bad options before reading any texts
+    key = _parser_key(parser_class)
+    loop = asyncio.get_running_loop()
+    source = texts.__aiter__()
+    next_text = None
+    chunk = []
+    pending = deque()
+    try:
+        while True:
+            if next_text is None and source is not None \
+                    and len(pending) < max_pending:
+                next_text = asyncio.ensure_future(source.__anext__())
+
+            waiting = {pending[0]} if pending else set()
+            if next_text is not None:
+                waiting.add(next_text)
+
+            if not waiting:
+                return
+
+            done, _ = await asyncio.wait(
+                waiting, timeout=max_delay if chunk else None,
+                return_when=asyncio.FIRST_COMPLETED)
+
+            if next_text in done:
+                try:
+                    chunk.append(next_text.result())
+                except StopAsyncIteration:
+                    source = None
+
+                next_text = None
+
+            if chunk and (len(chunk) >= chunk_size or source is None
+                          or not done):
+                pending.append(loop.run_in_executor(
+                    executor, _parse_chunk, key, options, chunk, html))
+                chunk = []
+
+            while pending and pending[0].done():
+                for fields in pending.popleft().result():
+                    yield ParseResult.from_entities(*fields)
+
+    finally:
+        if next_text is not None:
+            next_text.cancel()
+
+        for future in pending:
+            future.cancel()
+
+        # Worker threads share the Parsers of this process
+        _drop_parser(key)
+
+
+async def follow_shortlinks(shortlinks, max_workers=10, max_per_host=4,
+                            timeout=10, max_redirects=10, session=None,
+                            cache=None):
+    """Follow redirects in list of shortlinks, return dict of resulting URLs
+
+    The same as utils.follow_shortlinks, but with aiohttp: up to max_workers
+    links are followed at the same time, no more than max_per_host of them
+    on the same host. Pass an aiohttp.ClientSession as session to reuse its
+    connections. The cache is used from the default executor of the loop,
+    so a SqliteLinkCache does not block the loop on its file.
+    """
+    async with _Follower(max_workers, max_per_host, timeout, max_redirects,
+                         session, cache) as follower:
+        return await follower.follow_all(shortlinks)
+
+
+async def parse_and_follow(texts, executor=None, chunk_size=100,
+                           max_following=100, max_workers=10, max_per_host=4,
+                           timeout=10, max_redirects=10, session=None,
+                           cache=None, html=True, parser_class=Parser,
+                           **options):
+    """Parse texts and follow their URLs, yield (ParseResult, links) pairs.
+
+    links is a dict from each URL of the ParseResult to the URLs it
+    redirected to, as given by follow_shortlinks; URLs without http(s):// are
+    followed over https. The pairs come in input order, while the links of
+    up to max_following Tweets are being followed. A link that turns up again
+    while it is still being followed is only followed once. Parsing works as
+    for parse_stream, following as for follow_shortlinks.
+    """
+    async with _Follower(max_workers, max_per_host, timeout, max_redirects,
+                         session, cache) as follower:
+        results = parse_stream(texts, executor, chunk_size, html=html,
+                               parser_class=parser_class, **options)
+        pending = deque()
+        try:
+            async for result in results:
+                urls = [url.text for url in result.entities
+                        if type(url) is Url]
+                pending.append((result, asyncio.ensure_future(
+                    follower.follow_all(urls))))
+                while len(pending) > max_following \
+                        or (pending and pending[0][1].done()):
+                    result, links = pending.popleft()
+                    yield result, await links
+
+            while pending:
+                result, links = pending.popleft()
+                yield result, await links
+
+        finally:
+            for result, links in pending:
+                links.cancel()
+
+            await results.aclose()
+
+
+class _Follower(object):
+    """Follows shortlinks over one aiohttp session, within the limits"""
+
+    def __init__(self, max_workers, max_per_host, timeout, max_redirects,
+                 session, cache):
+        if aiohttp is None:
+            raise ImportError('Following shortlinks needs aiohttp')
+
+        self._slots = asyncio.Semaphore(max_workers)
+        self._host_slots = defaultdict(
+            lambda: asyncio.Semaphore(max_per_host))
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._max_redirects = max_redirects
+        self._session = session
+        self._own_session = session is None
+        self._max_workers = max_workers
+        self._cache = cache
+        self._following = {}
+
+    async def __aenter__(self):
+        if self._own_session:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._max_workers))
+
+        return self
+
+    async def __aexit__(self, *exc_info):
+        # Shielded tasks outlive callers that were cancelled, stop them before
+        # the session goes away, so no failure ends up in the cache
+        following = list(self._following.values())
+        for task in following:
+            task.cancel()
+
+        await asyncio.gather(*following, return_exceptions=True)
+        if self._own_session:
+            await self._session.close()
+
+    async def follow_all(self, shortlinks):
+        shortlinks = list(dict.fromkeys(shortlinks))
+        all_urls = await asyncio.gather(*[self.follow(shortlink)
+                                          for shortlink in shortlinks])
+        return dict(zip(shortlinks, all_urls))
+
+    async def follow(self, shortlink):
+        """Return the URLs on the way from shortlink, [] if it fails"""
+        if self._cache is not None:
+            all_urls = await self._run(self._cache.get, shortlink)
+            if all_urls is not None:
+                return all_urls
+
+        # Links followed at the same time share a single task, which is
+        # shielded so cancelling one caller does not cancel it for the others
+        if shortlink not in self._following:
+            self._following[shortlink] = asyncio.ensure_future(
+                self._follow(shortlink))
+
+        return await asyncio.shield(self._following[shortlink])
+
+    async def _follow(self, shortlink):
+        url = _with_scheme(shortlink)
+        try:
+            try:
+                async with self._slots:
+                    all_urls = await self._follow_shortlink(url)
+
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                all_urls = []
+
+            # Cached while the task is still there, so the link is not
+            # followed again by a lookup in between
+            if self._cache is not None:
+                await self._run(self._cache.set, shortlink, all_urls)
+
+        finally:
+            del self._following[shortlink]
+
+        return all_urls
+
+    def _run(self, function, *args):
+        """Run a cache method in the default executor of the loop"""
+        return asyncio.get_running_loop().run_in_executor(None, function,
+                                                          *args)
+
+    async def _follow_shortlink(self, url):
+        """Follow the redirects of a single shortlink, like utils does"""
+        all_urls = []
+        while len(all_urls) <= self._max_redirects:
+            host = urlsplit(url).netloc.lower()
+            async with self._host_slots[host]:
+                response = await self._session.head(
+                    url, allow_redirects=False, timeout=self._timeout)
+                response.release()
+                if response.status in HEAD_NOT_SUPPORTED:
+                    response = await self._session.get(
+                        url, allow_redirects=False, timeout=self._timeout)
+                    response.close()
+
+            all_urls.append(str(response.url))
+            location = response.headers.get('Location')
+            if response.status not in REDIRECT_STATUSES or location is None:
+                return all_urls
+
+            url = urljoin(str(response.url), location)
+
+        return []
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Parse a stream of Tweets from the command line and write entities as JSONL
+
+    $ python -m ttp tweets.jsonl --field text > entities.jsonl
+    $ cat tweets.txt | ttp --format text --workers 4 > entities.jsonl
+
+Every input line gives one output line, lines that are not valid JSON or lack
+the text field give null.
+"""
+from __future__ import unicode_literals, print_function
+import argparse
+import io
+import json
+import mmap
+import sys
+import time
+from itertools import tee
+
+try:
+    from .ttp import Parser, RESULT_FIELDS, SPAN_UNITS
+    from . import parallel
+except ImportError:  # imported from within ttp/, like tests.py does
+    from ttp import Parser, RESULT_FIELDS, SPAN_UNITS
+    import parallel
+
+OUTPUT_BUFFER_SIZE = 1 << 16
+
+
+def read_lines(path):
+    """Yield the lines of a file as bytes, memory-mapping it when possible"""
+    if path == '-':
+        for line in sys.stdin.buffer:
+            yield line
+        return
+
+    with open(path, 'rb') as f:
+        try:
+            lines = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):  # empty files, pipes
+            for line in f:
+                yield line
+            return
+
+        try:
+            for line in iter(lines.readline, b''):
+                yield line
+        finally:
+            lines.close()
+
+
+def read_texts(lines, field=None):
+    """Yield the text of each line, taken from field for JSONL, or None"""
+    keys = field.split('.') if field is not None else None
+    for line in lines:
+        line = line.decode('utf-8', 'replace').rstrip('\r\n')
+        if keys is None:
+            yield line
+            continue
+
+        try:
+            text = json.loads(line)
+            for key in keys:
+                text = text[key]
+
+        except (ValueError, KeyError, TypeError, IndexError):
+            text = None
+
+        yield text if isinstance(text, str) else None
+
+
+def result_to_dict(result, html=False):
+    entities = {'urls': result.urls, 'users': result.users,
+                'lists': result.lists, 'tags': result.tags,
+                'reply': result.reply}
+    if html:
+        entities['html'] = result.html
+
+    if result.partial:
+        entities['partial'] = True
+
+    return entities
+
+
+def parse_texts(texts, workers=1, chunk_size=1000, html=False, **options):
+    """Parse texts and yield a ParseResult, or None where the text is None"""
+    texts, missing = tee(texts)
+    texts = (text if text is not None else '' for text in texts)
+    if workers > 1:
+        results = parallel.parse_all(texts, workers, chunk_size, html,
+                                     **options)
+    else:
+        results = Parser(**options).parse_many(texts, html, chunk_size)
+
+    for text, result in zip(missing, results):
+        yield result if text is not None else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='ttp', description=__doc__.splitlines()[0])
+    parser.add_argument('input', nargs='?', default='-',
+                        help='file to read, default stdin')
+    parser.add_argument('-o', '--output', default='-',
+                        help='file to write, default stdout')
+    parser.add_argument('--format', choices=('jsonl', 'text'),
+                        default='jsonl', help='one JSON object or one '
+                        'plain text Tweet per line, default jsonl')
+    parser.add_argument('--field', default='text',
+                        help='JSON field holding the text, nested fields '
+                        'like extended_tweet.full_text work too')
+    parser.add_argument('--html', action='store_true',
+                        help='include the formatted HTML')
+    parser.add_argument('--spans', action='store_true',
+                        help='include the position of each entity')
+    parser.add_argument('--span-unit', choices=sorted(SPAN_UNITS),
+                        default='codepoint')
+    parser.add_argument('--entities', nargs='+', choices=sorted(RESULT_FIELDS),
+                        help='only parse for these fields, default all')
+    parser.add_argument('--max-length', type=int,
+                        help='truncate longer texts to this many characters')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of worker processes, default 1')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='do not report throughput on stderr')
+    args = parser.parse_args(argv)
+
+    field = args.field if args.format == 'jsonl' else None
+    texts = read_texts(read_lines(args.input), field)
+    results = parse_texts(texts, args.workers, args.chunk_size, args.html,
+                          include_spans=args.spans,
+                          span_unit=args.span_unit,
+                          max_length=args.max_length,
+                          entities=args.entities)
+
+    if args.output == '-':
+        output = io.BufferedWriter(sys.stdout.buffer, OUTPUT_BUFFER_SIZE)
+    else:
+        output = open(args.output, 'wb', OUTPUT_BUFFER_SIZE)
+
+    start = time.time()
+    count = skipped = 0
+    try:
+        for result in results:
+            count += 1
+            if result is None:
+                skipped += 1
+                output.write(b'null\n')
+            else:
+                output.write(json.dumps(result_to_dict(result, args.html),
+                                        ensure_ascii=False).encode('utf-8'))
+                output.write(b'\n')
+
+    finally:
+        if args.output == '-':
+            output.flush()
+            output.detach()
+        else:
+            output.close()
+
+    if not args.quiet:
+        seconds = time.time() - start
+        print('ttp: parsed %d lines (%d without text) in %.2fs, %.0f lines/s'
+              % (count, skipped, seconds, count / seconds if seconds else 0),
+              file=sys.stderr)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
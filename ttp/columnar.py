@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Parse batches of Tweets into flat entity columns for analytics
+
+Instead of a ParseResult per Tweet, parse_columns returns one row per entity
+spread over a few flat columns, which convert to NumPy arrays or a pyarrow
+Table without copying the numbers.
+"""
+from __future__ import unicode_literals, print_function
+from array import array
+
+try:
+    from .ttp import Parser, Url, Mention, ListMention, Hashtag
+except ImportError:  # imported from within ttp/, like tests.py does
+    from ttp import Parser, Url, Mention, ListMention, Hashtag
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# The values of the kind column
+KINDS = ('url', 'user', 'list', 'tag')
+_KIND_CODES = {Url: 0, Mention: 1, ListMention: 2, Hashtag: 3}
+
+
+class EntityColumns(object):
+    """The entities of a batch of Tweets, one row per entity
+
+    Columns:
+    - kind: array of signed chars, an index into KINDS
+    - doc: array of 64-bit ints, the index of the Tweet in the batch
+    - start, end: arrays of 64-bit ints, the position in the Tweet
+    - text: list of str, the URL, username, "username/listname" or hashtag
+
+    The rows are ordered by Tweet, and within a Tweet by position.
+    """
+
+    __slots__ = ('kind', 'doc', 'start', 'end', 'text', 'docs')
+
+    def __init__(self):
+        self.kind = array('b')
+        self.doc = array('q')
+        self.start = array('q')
+        self.end = array('q')
+        self.text = []
+        self.docs = 0
+
+    def __len__(self):
+        return len(self.text)
+
+    def columns(self):
+        """Return the columns as a dict of memoryviews and the text list"""
+        return {'kind': memoryview(self.kind), 'doc': memoryview(self.doc),
+                'start': memoryview(self.start), 'end': memoryview(self.end),
+                'text': self.text}
+
+    def to_numpy(self):
+        """Return the columns as a dict of NumPy arrays sharing the buffers"""
+        if numpy is None:
+            raise ImportError('EntityColumns.to_numpy needs numpy')
+
+        return {'kind': numpy.frombuffer(self.kind, numpy.int8),
+                'doc': numpy.frombuffer(self.doc, numpy.int64),
+                'start': numpy.frombuffer(self.start, numpy.int64),
+                'end': numpy.frombuffer(self.end, numpy.int64),
+                'text': numpy.array(self.text, dtype=object)}
+
+    def to_arrow(self):
+        """Return the columns as a pyarrow Table sharing the number buffers
+
+        The kind column is dictionary encoded with the names from KINDS.
+        """
+        if pyarrow is None:
+            raise ImportError('EntityColumns.to_arrow needs pyarrow')
+
+        def column(values, type):
+            return pyarrow.Array.from_buffers(
+                type, len(values), [None, pyarrow.py_buffer(values)])
+
+        kind = pyarrow.DictionaryArray.from_arrays(
+            column(self.kind, pyarrow.int8()), pyarrow.array(KINDS))
+        return pyarrow.Table.from_arrays(
+            [kind, column(self.doc, pyarrow.int64()),
+             column(self.start, pyarrow.int64()),
+             column(self.end, pyarrow.int64()),
+             pyarrow.array(self.text, pyarrow.string())],
+            ['kind', 'doc', 'start', 'end', 'text'])
+
+
+def parse_columns(texts, parser=None):
+    """Parse an iterable of texts into an EntityColumns instance.
+
+    Pass a Parser to choose options like span_unit or max_length, HTML is
+    never generated.
+    """
+    parser = parser if parser is not None else Parser()
+    columns = EntityColumns()
+    kind, doc, start, end, text = (columns.kind, columns.doc, columns.start,
+                                   columns.end, columns.text)
+    kind_codes = _KIND_CODES
+    parse = parser._parse_fields
+    index = -1
+    for index, tweet in enumerate(texts):
+        for entity in parse(tweet, False)[0]:
+            code = kind_codes[type(entity)]
+            kind.append(code)
+            doc.append(index)
+            start.append(entity[-2])
+            end.append(entity[-1])
+            text.append(entity[0] if code != 2
+                        else '%s/%s' % (entity.user, entity.list_name))
+
+    columns.docs = index + 1
+    return columns
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Parse Tweets on several CPU cores with a pool of worker processes"""
+from __future__ import unicode_literals, print_function
+import itertools
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from .ttp import Parser, ParseResult
+except ImportError:  # imported from within ttp/, like tests.py does
+    from ttp import Parser, ParseResult
+
+# The Parsers of the latest calls run in this process, by their key, see
+# _parse_chunk. The workers of an executor shared by several calls keep only
+# the last MAX_PARSERS of them.
+_parsers = OrderedDict()
+_parsers_lock = threading.Lock()
+MAX_PARSERS = 8
+
+# Numbers the calls of this process, see _parser_key
+_keys = itertools.count()
+
+
+def _parser_key(parser_class):
+    """Return a key for the Parser of one call, unique across processes"""
+    return parser_class, os.getpid(), next(_keys)
+
+
+def _parse_chunk(key, options, texts, html):
+    """Parse a chunk of texts in a worker, returning plain tuples.
+
+    Plain tuples of entity records pickle faster and smaller than ParseResult
+    instances, the parent process turns them back into ParseResults. Any
+    executor can run this: the Parser is created by the first chunk of a call
+    in each process, from key made by _parser_key and options, and is kept
+    for the other chunks with the same key.
+    """
+    with _parsers_lock:
+        parser = _parsers.get(key)
+        if parser is None:
+            parser = _parsers[key] = key[0](**options)
+            while len(_parsers) > MAX_PARSERS:
+                _parsers.popitem(last=False)
+
+    results = parser.parse_many(texts, html, chunk_size=len(texts))
+    return [(result.entities, result.reply, result.html, result.include_spans,
+             result.partial, result.watched) for result in results]
+
+
+def _drop_parser(key):
+    """Forget the Parser of a call that is done, in this process"""
+    with _parsers_lock:
+        _parsers.pop(key, None)
+
+
+def parse_all(texts, workers=None, chunksize=500, html=True,
+              parser_class=Parser, **options):
+    """Parse texts in worker processes and yield their ParseResults in order.
+
+    The texts are sent to the workers in chunks of chunksize, and only a few
+    chunks per worker are in flight at any time, so texts can be an iterable
+    of any length. Extra keyword arguments such as max_url_length and
+    include_spans are passed on to parser_class in each worker, which has to
+    be importable by the workers when it is a Parser subclass.
+    """
+    workers = workers or os.cpu_count() or 1
+    texts = iter(texts)
+    pending = deque()
+    key = _parser_key(parser_class)
+    with ProcessPoolExecutor(workers) as executor:
+        try:
+            while True:
+                while len(pending) < workers * 2:
+                    chunk = list(itertools.islice(texts, chunksize))
+                    if not chunk:
+                        break
+
+                    pending.append(executor.submit(_parse_chunk, key, options,
+                                                   chunk, html))
+
+                if not pending:
+                    return
+
+                for fields in pending.popleft().result():
+                    yield ParseResult.from_entities(*fields)
+
+        finally:
+            for future in pending:
+                future.cancel()
@@ -20,13 +20,46 @@
 from __future__ import unicode_literals
 
 import re
-import sys
-try:
-    from urllib.parse import quote  # Python3
-except ImportError:
-    from urllib import quote
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
+from time import perf_counter as clock
+from urllib.parse import quote
+
+__version__ = "2.0.0.0"
+
+class _LazyPattern(object):
+
+    '''A module level pattern that is compiled when it is first used.
+
+    Compiling all of them takes longer than the rest of importing the module,
+    and most are not needed for every Tweet. Once compiled, the pattern takes
+    the place of the _LazyPattern in the module, so the functions here use it
+    directly from then on.
+
+    '''
+
+    __slots__ = ('_name', '_expression', '_flags')
+
+    def __init__(self, name, expression, flags=0):
+        self._name = name
+        self._expression = expression
+        self._flags = flags
+
+    def compile(self):
+        '''Return the compiled pattern.'''
+        pattern = re.compile(self._expression, self._flags)
+        globals()[self._name] = pattern
+        return pattern
+
+    def __getattr__(self, name):
+        return getattr(self.compile(), name)
+
+    def __repr__(self):
+        return '<lazy %r>' % self.compile()
 
-__version__ = "1.1.1.0"
 
 AT_SIGNS = r'[@\uff20]'
 UTF_CHARS = r'a-z0-9_\u00c0-\u00d6\u00d8-\u00f6\u00f8-\u00ff'
@@ -35,27 +68,29 @@ SPACES = r'[\u0020\u00A0\u1680\u180E\u2002-\u202F\u205F\u2060\u3000]'
 # Lists
 LIST_PRE_CHARS = r'([^a-z0-9_]|^)'
 LIST_END_CHARS = r'([a-z0-9_]{1,20})(/[a-z][a-z0-9\x80-\xFF-]{0,79})?'
-LIST_REGEX = re.compile(LIST_PRE_CHARS + '(' + AT_SIGNS + '+)' + LIST_END_CHARS,
-                        re.IGNORECASE)
+LIST_REGEX = _LazyPattern('LIST_REGEX', LIST_PRE_CHARS + '(' + AT_SIGNS + '+)'
+                         + LIST_END_CHARS, re.IGNORECASE)
 
 # Users
-if sys.version_info >= (3, 0):
-    username_flags = re.ASCII | re.IGNORECASE
-else:
-    username_flags = re.IGNORECASE
-USERNAME_REGEX = re.compile(r'\B' + AT_SIGNS + LIST_END_CHARS, username_flags)
-REPLY_REGEX = re.compile(r'^(?:' + SPACES + r')*' + AT_SIGNS
-                         + r'([a-z0-9_]{1,20}).*', re.IGNORECASE)
+username_flags = re.ASCII | re.IGNORECASE
+USERNAME_REGEX = _LazyPattern('USERNAME_REGEX',
+                              r'\B' + AT_SIGNS + LIST_END_CHARS, username_flags)
+REPLY_REGEX = _LazyPattern('REPLY_REGEX', r'^(?:' + SPACES + r')*' + AT_SIGNS
+                           + r'([a-z0-9_]{1,20}).*', re.IGNORECASE)
 
 # Hashtags
 HASHTAG_EXP = r'(^|[^0-9A-Z&/]+)(#|\uff03)([0-9A-Z_]*[A-Z_]+[%s]*)' % UTF_CHARS
-HASHTAG_REGEX = re.compile(HASHTAG_EXP, re.IGNORECASE)
+HASHTAG_REGEX = _LazyPattern('HASHTAG_REGEX', HASHTAG_EXP, re.IGNORECASE)
 
 
 # URLs
 PRE_CHARS = r'(?:[^/"\':!=]|^|\:)'
-DOMAIN_CHARS = r'([\.-]|[^\s_\!\.\/])+\.[a-z]{2,}(?::[0-9]+)?'
-PATH_CHARS = r'(?:[\.,]?[%s!\*\'\(\);:=\+\$/%s#\[\]\-_,~@])' % (UTF_CHARS, '%')
+# A domain is a run of these characters up to the last ".tld" in the run. The
+# characters must not be split into overlapping alternatives, or a run without
+# a valid ending backtracks exponentially.
+DOMAIN_CHARS = r'([^\s_\!\/]+)\.[a-z]{2,}(?::[0-9]+)?'
+# Only a period may precede a path character; a comma already is one
+PATH_CHARS = r'(?:\.?[%s!\*\'\(\);:=\+\$/%s#\[\]\-_,~@])' % (UTF_CHARS, '%')
 QUERY_CHARS = r'[a-z0-9!\*\'\(\);:&=\+\$/%#\[\]\-_\.,~]'
 
 # Valid end-of-path chracters (so /foo. does not gobble the period).
@@ -64,20 +99,339 @@ QUERY_CHARS = r'[a-z0-9!\*\'\(\);:&=\+\$/%#\[\]\-_\.,~]'
 PATH_ENDING_CHARS = r'[%s\)=#/\-\+]' % UTF_CHARS
 QUERY_ENDING_CHARS = '[a-z0-9_&=#\-\+]'
 
-URL_REGEX = re.compile('((%s)((https?://|www\\.)(%s)(\/(%s*%s)?)?(\?%s*%s)?))'
-                       % (PRE_CHARS, DOMAIN_CHARS, PATH_CHARS,
-                          PATH_ENDING_CHARS, QUERY_CHARS, QUERY_ENDING_CHARS),
-                       re.IGNORECASE)
+URL_REGEX = _LazyPattern(
+    'URL_REGEX', '((%s)((https?://|www\\.)(%s)(\/(%s*%s)?)?(\?%s*%s)?))'
+    % (PRE_CHARS, DOMAIN_CHARS, PATH_CHARS, PATH_ENDING_CHARS, QUERY_CHARS,
+       QUERY_ENDING_CHARS), re.IGNORECASE)
+
+# Where URL_REGEX can match, see _find_urls
+URL_START_REGEX = _LazyPattern('URL_START_REGEX', r'(?=(https?://|www\.))',
+                               re.IGNORECASE)
+DOMAIN_RUN_REGEX = _LazyPattern('DOMAIN_RUN_REGEX', r'[^\s_\!\/]*')
+DOMAIN_END_REGEX = _LazyPattern('DOMAIN_END_REGEX', r'.*\.[a-z]{2}',
+                                re.IGNORECASE | re.DOTALL)
+URL_NOT_PRE_CHARS = '/"\'!='
+
+
+def _ascii(exp):
+    '''Restrict a part of a pattern to ASCII, like USERNAME_REGEX.'''
+    return '(?a:%s)' % exp
+
+
+# Users, lists and hashtags in a single pattern. Each alternative starts at
+# the @ or # sign, the rules for the character in front of it are expressed as
+# lookbehinds so the regex engine can skip ahead to the next sign. The
+# username alternative does not match names followed by a list, which are left
+# to the list alternative, just like USERNAME_REGEX and LIST_REGEX did.
+USER_PRE_CHARS = r'(?<![a-z0-9_].)'
+USER_EXP = (r'(?=(?P<user_name>[a-z0-9_]{1,20}))(?P=user_name)(?!/[a-z])')
+# A list is only tried at the first @ of a run that may start one, the result
+# would be the same for any later @ and trying each of them is quadratic
+LIST_SIGN_PRE_CHARS = (r'(?:(?<=[^a-z0-9_@\uff20].)|(?<=^.)(?![@\uff20])'
+                       r'|(?<=^[@\uff20].)|(?<=[a-z0-9_][@\uff20].))')
+# a username following another @ is a list only if USERNAME_REGEX left it
+LIST_EXP = (r'(?P<list_at>[@\uff20]*)(?:(?<![@\uff20][@\uff20])|%s)'
+            r'(?P<list_user>[a-z0-9_]{1,20})'
+            r'(?P<list_name>/[a-z][a-z0-9\x80-\xFF-]{0,79})'
+            % _ascii(r'(?![a-z0-9_])|(?=[a-z0-9_]{1,20}/[a-z])'))
+HASHTAG_PRE_CHARS = r'(?<![0-9A-Z&/].)'
+HASHTAG_BODY = r'[0-9A-Z_]*[A-Z_]+[%s]*' % UTF_CHARS
+
+
+def _entity_exp(check_pre=True, types=('user', 'list', 'tag')):
+    exps = []
+    if 'user' in types:
+        user_exp = (USER_PRE_CHARS if check_pre else '') + USER_EXP
+        exps.append(r'(?<=[@\uff20])(?P<user>%s)' % _ascii(user_exp))
+
+    if 'list' in types:
+        exps.append(r'(?<=[@\uff20])%s(?P<list>%s)'
+                    % (LIST_SIGN_PRE_CHARS if check_pre else '', LIST_EXP))
+
+    if 'tag' in types:
+        exps.append(r'(?<=[#\uff03])%s(?P<tag>%s)'
+                    % (HASHTAG_PRE_CHARS if check_pre else '', HASHTAG_BODY))
+
+    return r'[@\uff20#\uff03](?:%s)' % '|'.join(exps)
+
+
+def _entity_regex(check_pre=True, types=('user', 'list', 'tag')):
+    return re.compile(_entity_exp(check_pre, types), re.IGNORECASE)
+
+
+# A hashtag whatever comes before it, see Parser._last_tag
+HASHTAG_AT_REGEX = _LazyPattern('HASHTAG_AT_REGEX',
+                                _entity_exp(False, ('tag',)), re.IGNORECASE)
+
+# All the entity types a scanner looks for, see _scanner
+ENTITY_SCAN_TYPES = ('user', 'list', 'tag')
+
+# The search and follow-up patterns for each combination of entity types,
+# compiled on first use, see _scanner
+_SCANNERS = {}
+
+
+def _scanner(types):
+    '''Return the patterns that only look for the given entity types.
+
+    types is a tuple in the order of _entity_regex, an empty tuple stands for
+    URLs only and gives None.
+
+    '''
+    if not types:
+        return None
+
+    if types not in _SCANNERS:
+        after = {}
+        for last, following in (('url', ('user', 'list', 'tag')),
+                                ('user', ('list', 'tag')), ('list', ('tag',))):
+            following = tuple(kind for kind in following if kind in types)
+            if following and (last == 'url' or last in types):
+                after[last] = _entity_regex(False, following)
+
+        _SCANNERS[types] = (_entity_regex(types=types), after)
+
+    return _SCANNERS[types]
+
+
+# HASHTAG_REGEX skipped to the last # in a run of these characters
+HASHTAG_PRE_RUN_REGEX = _LazyPattern('HASHTAG_PRE_RUN_REGEX', r'[^0-9A-Z&/]*',
+                                     re.IGNORECASE)
 
 # Registered IANA one letter domains
 IANA_ONE_LETTER_DOMAINS = ('x.com', 'x.org', 'z.com', 'q.net', 'q.com', 'i.net')
 
 
+def _find_urls(text, pos=0, endpos=None):
+    '''Yield the same matches as URL_REGEX.finditer, in linear time.
+
+    URL_REGEX is only tried where a protocol or www. follows a valid prefix
+    character, and only if the run of domain characters after it still has a
+    ".tld" left. Every run is examined once, so a long run without a valid
+    domain is not rescanned for each www. in it. Texts without http or www.
+    are not searched at all.
+
+    Only the text from pos to endpos is searched, the character before pos
+    must be one that no URL contains (see IncrementalParse).
+
+    '''
+    endpos = len(text) if endpos is None else endpos
+    lowered = text[pos:endpos].lower()
+    if 'http' not in lowered and 'www.' not in lowered:
+        return
+
+    # The end of the last match, a URL at pos can still have the character
+    # in front of pos as its prefix
+    last_end = pos - 1 if pos else 0
+    run_start = run_end = last_dot = -1
+    for start in URL_START_REGEX.finditer(text, pos, endpos):
+        domain = start.end(1)
+        start = start.start()
+        if start - 1 < last_end:
+            if start != last_end or last_end:
+                continue
+
+        elif text[start - 1] in URL_NOT_PRE_CHARS:
+            continue
+
+        else:
+            start -= 1
+
+        if not run_start <= domain < run_end:
+            run_start = domain
+            run_end = DOMAIN_RUN_REGEX.match(text, domain, endpos).end()
+            end = DOMAIN_END_REGEX.match(text, domain, run_end)
+            last_dot = end.end() - 3 if end is not None else -1
+
+        if last_dot <= domain:
+            continue
+
+        match = URL_REGEX.match(text, start, endpos)
+        if match is not None:
+            last_end = match.end()
+            yield match
+
+
+def _utf16_length(text):
+    return len(text.encode('utf-16-le', 'surrogatepass')) // 2
+
+
+def _utf8_length(text):
+    return len(text.encode('utf-8', 'surrogatepass'))
+
+
+# Functions measuring a piece of text in each span unit
+SPAN_UNITS = {'codepoint': None, 'utf16': _utf16_length, 'utf8': _utf8_length}
+
+
+def _convert_spans(text, entities, length):
+    '''Convert the code point positions of entities with length.
+
+    The entities are in text order, so only the text between one position and
+    the next is measured and the whole text is encoded at most once.
+
+    '''
+    pos = offset = 0
+    converted = []
+    for entity in entities:
+        start, end = entity[-2:]
+        offset += length(text[pos:start])
+        start_offset = offset
+        offset += length(text[start:end])
+        pos = end
+        converted.append(entity._make(entity[:-2] + (start_offset, offset)))
+
+    return converted
+
+
+# The fields available in the template of each entity type, see Parser
+TEMPLATE_FIELDS = {
+    'url': ('url', 'text'),
+    'user': ('at', 'user'),
+    'list': ('at', 'user', 'list_name'),
+    'tag': ('hash', 'tag', 'quoted'),
+}
+
+# Templates giving the same HTML as the format_* methods of Parser
+DEFAULT_TEMPLATES = {
+    'url': '<a href="{url}">{text}</a>',
+    'user': '<a href="https://twitter.com/{user}">{at}{user}</a>',
+    'list': '<a href="https://twitter.com/{user}/lists/{list_name}">'
+            '{at}{user}/{list_name}</a>',
+    'tag': '<a href="https://twitter.com/hashtag/{quoted}">{hash}{tag}</a>',
+}
+
+
+def compile_template(kind, template):
+    '''Compile a template into a function taking its fields in order.
+
+    Templates with only plain fields are split once into a %-format string
+    and the order its fields are taken in, which builds the HTML in one step
+    like the format_* methods do, others become a str.format method with
+    positional fields.
+
+    '''
+    fields = TEMPLATE_FIELDS[kind]
+    parts = []
+    percent_parts = []
+    used = []
+    # string is only imported here, it is slow to import
+    from string import Formatter
+
+    for literal, field, spec, conversion in Formatter().parse(template):
+        parts.append(literal.replace('{', '{{').replace('}', '}}'))
+        percent_parts.append(literal.replace('%', '%%'))
+        if field is None:
+            continue
+
+        if field not in fields:
+            raise ValueError('Unknown field {%s} in the %s template, use %s'
+                             % (field, kind, ', '.join(fields)))
+
+        parts.append('{%d%s%s}' % (fields.index(field),
+                                   '!' + conversion if conversion else '',
+                                   ':' + spec if spec else ''))
+        percent_parts.append('%s')
+        used.append(field if not (spec or conversion) else None)
+
+    if None in used:
+        return ''.join(parts).format
+
+    form = ''.join(percent_parts)
+    order = tuple(fields.index(field) for field in used)
+    if order == tuple(range(len(fields))):
+        def template_function(*values):
+            return form % values
+
+    elif len(order) > 1:
+        pick = itemgetter(*order)
+
+        def template_function(*values):
+            return form % pick(values)
+
+    elif order:
+        index = order[0]
+
+        def template_function(*values):
+            return form % (values[index],)
+
+    else:
+        html = form % ()
+
+        def template_function(*values):
+            return html
+
+    return template_function
+
+
+class Url(namedtuple('Url', 'text start end')):
+
+    '''A URL and its position in the Tweet.'''
+
+    __slots__ = ()
+
+
+class Mention(namedtuple('Mention', 'user start end')):
+
+    '''A username and its position in the Tweet.'''
+
+    __slots__ = ()
+
+
+class ListMention(namedtuple('ListMention', 'user list_name start end')):
+
+    '''A list and its position in the Tweet.'''
+
+    __slots__ = ()
+
+
+class Hashtag(namedtuple('Hashtag', 'tag start end')):
+
+    '''A hashtag and its position in the Tweet.'''
+
+    __slots__ = ()
+
+
+def _entity_list(name, kind):
+    '''Return a property with the items of one entity type as a list.
+
+    The list is built from the entities on first access, like the lists of
+    1.1.1 it can then be changed or replaced.
+
+    '''
+    slot = '_' + name
+
+    def get(self):
+        items = getattr(self, slot)
+        if items is None:
+            include_spans = self.include_spans
+            items = []
+            for entity in self._records(kind):
+                item = entity[:-2]
+                if include_spans:
+                    items.append(item + (entity[-2:],))
+                else:
+                    items.append(item if len(item) > 1 else item[0])
+
+            setattr(self, slot, items)
+
+        return items
+
+    def set(self, items):
+        setattr(self, slot, items)
+
+    return property(get, set)
+
+
 class ParseResult(object):
 
     '''A class containing the results of a parsed Tweet.
 
     Attributes:
+    - entities:
+        A tuple of all the Url, Mention, ListMention and Hashtag records in
+        the Tweet, in the order they appear in the text.
+
     - urls:
         A list containing all the valid urls in the Tweet.
 
@@ -103,72 +457,1116 @@ class ParseResult(object):
         To change the formatting sublcass twp.Parser and override the format_*
         methods.
 
+    - partial
+        True if the Tweet was too long or took too long to parse, the
+        entities and HTML then only cover the part that was parsed.
+
+    - watched
+        A tuple of the IDs of the Parser's watchlist that the entities
+        matched, in the order of the text, see watchlist.Watchlist.
+
+    The urls, users, lists and tags are built from the entities on first
+    access, and are not kept in step with them after that. With
+    include_spans each item also has a (start, end) tuple.
+
     '''
 
-    def __init__(self, urls, users, reply, lists, tags, html):
-        self.urls = urls if urls else []
-        self.users = users if users else []
-        self.lists = lists if lists else []
+    __slots__ = ('entities', 'reply', 'html', 'include_spans', 'partial',
+                 'watched', '_urls', '_users', '_lists', '_tags')
+
+    def __init__(self, urls, users, reply, lists, tags, html, partial=False):
+        entities = []
+        include_spans = False
+        for kind, items in ((Url, urls), (Mention, users),
+                            (ListMention, lists), (Hashtag, tags)):
+            for item in items or ():
+                if kind is not ListMention:
+                    item = item if isinstance(item, tuple) else (item,)
+
+                if len(item) == len(kind._fields) - 1:
+                    include_spans = True
+                    item = item[:-1] + tuple(item[-1])
+                else:
+                    item += (None, None)
+
+                entities.append(kind(*item))
+
+        if include_spans:
+            entities.sort(key=lambda entity: entity.start)
+
+        self.entities = tuple(entities)
         self.reply = reply if reply else None
-        self.tags = tags if tags else []
         self.html = html
+        self.include_spans = include_spans
+        self.partial = partial
+        self.watched = ()
+        self._urls = self._users = self._lists = self._tags = None
+
+    @classmethod
+    def from_entities(cls, entities, reply, html, include_spans=False,
+                      partial=False, watched=()):
+        '''Create a ParseResult from a sequence of entity records.'''
+        result = cls.__new__(cls)
+        result.entities = tuple(entities)
+        result.reply = reply
+        result.html = html
+        result.include_spans = include_spans
+        result.partial = partial
+        result.watched = watched
+        result._urls = result._users = result._lists = result._tags = None
+        return result
+
+    def _records(self, kind):
+        return [entity for entity in self.entities if type(entity) is kind]
+
+    urls = _entity_list('urls', Url)
+    users = _entity_list('users', Mention)
+    lists = _entity_list('lists', ListMention)
+    tags = _entity_list('tags', Hashtag)
+
+
+class LazyParseResult(ParseResult):
+
+    '''A ParseResult that only parses as much of the Tweet as is accessed.
+
+    The urls, users, lists and tags are looked for on first access and kept
+    for later ones, along with the URLs, as anything inside of them does not
+    count as a user, list or hashtag (see _scan_types). The entities and html
+    parse the whole Tweet at once, as Parser.parse does.
+
+    The partial flag only covers what was parsed so far.
+
+    '''
+
+    __slots__ = ('_parser', '_text', '_found', '_entities', '_html',
+                 '_reply', '_partial')
+
+    def __init__(self, parser, text, html, include_spans, partial):
+        self._parser = parser
+        self._text = text
+        self._found = {}
+        self._entities = None
+        self._html = _NOT_PARSED if html else None
+        self._reply = _NOT_PARSED
+        self._partial = partial
+        self.include_spans = include_spans
+        self._urls = self._users = self._lists = self._tags = None
+
+    def _records(self, kind):
+        if kind not in self._found:
+            names = {ENTITY_NAMES[kind]}
+            if kind is Mention or kind is ListMention:
+                names = {'user', 'list'}
+
+            types = _scan_types(self._text, names & self._parser._wanted)
+            entities, partial = [], False
+            if types is not None:
+                entities, partial = self._parser._find_entities(self._text,
+                                                                types)
+                names.update(types, ('url',))
+
+            self._add(entities, names, partial)
+
+        return self._found[kind]
+
+    def _add(self, entities, names, partial):
+        wanted = self._parser._wanted
+        for name in names:
+            kind = ENTITY_TYPES[name]
+            self._found[kind] = [entity for entity in entities
+                                 if type(entity) is kind] \
+                if name in wanted else []
+
+        self._partial = self._partial or partial
+
+    def _parse(self):
+        fields = self._parser._parse_fields(self._text,
+                                            self._html is _NOT_PARSED)
+        self._entities = fields[0]
+        self._add(fields[0], ENTITY_TYPES, fields[4])
+        if self._html is _NOT_PARSED:
+            self._html = fields[2]
+
+    @property
+    def entities(self):
+        if self._entities is None:
+            self._parse()
+
+        return self._entities
+
+    @property
+    def html(self):
+        if self._html is _NOT_PARSED:
+            self._parse()
+
+        return self._html
+
+    @property
+    def reply(self):
+        if self._reply is _NOT_PARSED:
+            self._reply = self._parser._reply(self._text)
+
+        return self._reply
+
+    @property
+    def partial(self):
+        return self._partial
+
+    @property
+    def watched(self):
+        return self._parser._watch(self.entities)
+
+
+# Stands for a LazyParseResult attribute that was not parsed yet
+_NOT_PARSED = object()
+
+# Where IncrementalParse can split the text, see there
+EDIT_BOUNDARY_REGEX = _LazyPattern(
+    'EDIT_BOUNDARY_REGEX', r'(?<=[0-9A-Za-z&/])\s|\s(?=[0-9A-Za-z&/])')
+
+# The part of a Tweet that REPLY_REGEX looks at
+REPLY_PREFIX_REGEX = _LazyPattern(
+    'REPLY_PREFIX_REGEX', r'(?:%s)*(?:%s[a-z0-9_]{0,20})?'
+    % (SPACES, AT_SIGNS), re.IGNORECASE)
+
+
+class IncrementalParse(object):
+
+    '''The entities and HTML of a text that is edited, like in a compose box.
+
+    Each edit only rescans a window around the changed part of the text,
+    widened on both sides to a boundary: a whitespace character next to an
+    ASCII letter, digit, & or /. No entity crosses such a boundary, and
+    the scanner has no state to carry over it, so the entities on either side
+    of the window are kept, those after it are only moved. The window is
+    usually a few words wide, but spans the whole text when it has no
+    boundaries, e.g. in CJK text without spaces.
+
+    A text that is too long or runs out of time, which gives a partial
+    result, is parsed in full again on the next edit.
+
+    '''
+
+    __slots__ = ('_parser', '_html', '_text', '_parsed', '_records',
+                 '_html_ends', '_html_text', '_reply', '_reply_end',
+                 '_partial', '_result')
+
+    def __init__(self, parser, text, html):
+        self._parser = parser
+        self._html = html
+        self._text = ''
+        self._partial = True
+        self.edit(0, 0, text)
+
+    @property
+    def text(self):
+        '''The current text.'''
+        return self._text
+
+    @property
+    def result(self):
+        '''The ParseResult of the current text.'''
+        if self._result is None:
+            parser = self._parser
+            records = self._records
+            if parser._span_length is not None:
+                records = parser._convert_spans(self._parsed, records,
+                                                parser._span_length)
+
+            self._result = ParseResult.from_entities(
+                records, self._reply, self._html_text,
+                parser._include_spans, self._partial,
+                parser._watch(self._records))
+
+        return self._result
+
+    def append(self, text):
+        '''Add text to the end, return the new ParseResult.'''
+        return self.edit(len(self._text), 0, text)
+
+    def edit(self, offset, deleted=0, inserted=''):
+        '''Replace deleted characters at offset with inserted.
+
+        Returns the ParseResult of the new text. Raises a ValueError if the
+        edit is outside of the text, or for a text that is too long when the
+        Parser rejects those.
+
+        '''
+        old = self._text
+        if not 0 <= offset <= offset + deleted <= len(old):
+            raise ValueError('Edit of %d characters at %d is outside of the '
+                             'text of %d characters'
+                             % (deleted, offset, len(old)))
+
+        text = old[:offset] + inserted + old[offset + deleted:]
+        parsed, too_long = self._parser._truncate(text)
+        full = self._partial or too_long
+        self._text = text
+        self._parsed = parsed
+        self._result = None
+        if full or offset < self._reply_end:
+            self._reply = self._parser._reply(parsed)
+            self._reply_end = REPLY_PREFIX_REGEX.match(parsed).end() + 1
+
+        if full:
+            self._records, self._html_ends, self._html_text, partial = \
+                self._scan(0, len(parsed))
+            self._partial = too_long or partial
+            return self.result
+
+        # The window, and where it ended before the edit
+        start = self._boundary_before(parsed, offset)
+        end = self._boundary_after(parsed, offset + len(inserted))
+        moved = len(inserted) - deleted
+        old_end = end - moved
+
+        records, html_ends, html, partial = self._scan(start, end)
+        left = self._first_at(start)
+        right = self._first_at(old_end) if not partial \
+            else len(self._records)
+
+        if self._html:
+            old_html = self._html_text
+            html_start = self._html_position(left, start)
+            html_end = self._html_position(right, old_end)
+            html_moved = html_start + len(html) - html_end
+            self._html_ends = self._html_ends[:left] \
+                + [html_start + html_end for html_end in html_ends] \
+                + [html_end + html_moved
+                   for html_end in self._html_ends[right:]]
+            self._html_text = old_html[:html_start] + html \
+                + old_html[html_end:]
+
+        self._records = self._records[:left] + records \
+            + [_moved(record, moved) for record in self._records[right:]]
+        self._partial = partial
+        return self.result
+
+    def _boundary_before(self, text, offset):
+        '''Return the last boundary in front of an edit at offset.
+
+        The characters on both sides of it are the same before and after the
+        edit, so the entities up to there stay the same.
+
+        '''
+        size = 64
+        while True:
+            start = max(offset - size, 0)
+            boundaries = list(EDIT_BOUNDARY_REGEX.finditer(text, start,
+                                                           offset))
+            if boundaries:
+                return boundaries[-1].end()
+
+            if not start:
+                return 0
+
+            size *= 2
+
+    def _boundary_after(self, text, offset):
+        '''Return the first boundary behind edited text ending at offset.'''
+        boundary = EDIT_BOUNDARY_REGEX.search(text, offset + 1)
+        return boundary.end() if boundary is not None else len(text)
+
+    def _first_at(self, pos):
+        '''Return the index of the first entity starting at or after pos.'''
+        records = self._records
+        low, high = 0, len(records)
+        while low < high:
+            middle = (low + high) // 2
+            if records[middle][-2] < pos:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def _html_position(self, index, pos):
+        '''Return where pos, behind the entity before index, is in the HTML.'''
+        if not index:
+            return pos
+
+        return self._html_ends[index - 1] + pos - self._records[index - 1][-1]
+
+    def _scan(self, start, end):
+        '''Find the entities from start to end, and the HTML of that part.
+
+        Returns the records, where each of them ends in the HTML counting
+        from start, the HTML and whether parsing ran out of time. The HTML
+        then runs to the end of the text.
+
+        '''
+        parser = self._parser
+        text = self._parsed
+        context = _ParseContext(parser._deadline())
+        wanted = parser._wanted
+        records, html_ends, html = [], [], []
+        pos = start
+        length = 0
+        for kind, entity_start, entity_end, args in parser._entities(
+                text, context, _scanner(ENTITY_SCAN_TYPES), start, end):
+            if kind in wanted:
+                records.append(context.entities[-1])
+                if self._html:
+                    piece = parser._format_entity(kind, args)
+                    html.append(text[pos:entity_start])
+                    html.append(piece)
+                    length += entity_start - pos + len(piece)
+                    html_ends.append(length)
+                    pos = entity_end
+
+        if not self._html:
+            return records, None, None, context.partial
+
+        html.append(text[pos:end if not context.partial else len(text)])
+        return records, html_ends, ''.join(html), context.partial
+
+
+def _moved(record, offset):
+    '''Return an entity record moved by offset characters.'''
+    return tuple.__new__(type(record), record[:-2] + (record[-2] + offset,
+                                                      record[-1] + offset))
+
+
+# The record of each entity type, by the names used in _entity_regex
+ENTITY_TYPES = {'url': Url, 'user': Mention, 'list': ListMention,
+                'tag': Hashtag}
+ENTITY_NAMES = dict((kind, name) for name, kind in ENTITY_TYPES.items())
+
+# The names for the entities argument of Parser
+RESULT_FIELDS = {'urls': 'url', 'users': 'user', 'lists': 'list',
+                 'tags': 'tag', 'reply': 'reply'}
+
+# A hashtag here could only follow a username or list, see _scan_types
+TAG_AFTER_WORD_REGEX = _LazyPattern('TAG_AFTER_WORD_REGEX',
+                                    r'[0-9a-z][#\uff03]', re.IGNORECASE)
+
+
+def _scan_types(text, names):
+    '''Return the entity types to look for to find those in names in text.
+
+    Users and lists are always looked for together. Hashtags alone, or users
+    and lists alone, give the same result as looking for all of them, except
+    that a hashtag can directly follow a username. Only texts where that may
+    happen are scanned for all of them. URLs are always found, anything
+    inside of them does not count, but None is returned when nothing needs
+    to be found.
+
+    '''
+    at_sign = '@' in text or '\uff20' in text
+    tags = 'tag' in names and ('#' in text or '\uff03' in text)
+    users = ('user' in names or 'list' in names) and at_sign
+    if tags and not users:
+        if not (at_sign and TAG_AFTER_WORD_REGEX.search(text)):
+            return ('tag',)
+
+    elif users and not tags:
+        return ('user', 'list')
+
+    elif not tags:
+        return () if 'url' in names else None
+
+    return ('user', 'list', 'tag')
+
+
+class _ParseContext(object):
+
+    '''The entities found so far by a single call to Parser.parse.
+
+    Keeping them here instead of on the Parser makes a Parser instance safe
+    to share between threads.
+
+    '''
+
+    def __init__(self, deadline=None):
+        self.entities = []
+        self.deadline = deadline
+        self.partial = False
+
+    def out_of_time(self):
+        '''Return True, and mark the result partial, past the deadline.'''
+        if self.deadline is not None and clock() >= self.deadline:
+            self.partial = True
+
+        return self.partial
+
+
+class _PartialResult(Exception):
+
+    '''Carries a result that ran out of time past the result cache.'''
+
+    def __init__(self, fields):
+        Exception.__init__(self)
+        self.fields = fields
+
+
+# The stages of parsing that ParseStats times
+STAGES = ('parse', 'reply', 'urls', 'scan', 'scan_user', 'scan_list',
+          'scan_tag', 'format_url', 'format_user', 'format_list', 'format_tag',
+          'spans')
+
+
+class ParseStats(object):
+
+    '''Counts the calls, time and entities of each stage of parsing.
+
+    Pass one as stats to a Parser to see where its time goes, or any other
+    object with a record method, e.g. one that feeds a metrics system. The
+    stages in STAGES are:
+    - parse: a whole Tweet, including the stages below
+    - reply: finding the username the Tweet replies to
+    - urls: finding the URLs
+    - scan: finding the users, lists and hashtags between the URLs
+    - scan_user, scan_list, scan_tag: the part of scan that found an entity
+      of the type, one call per entity
+    - format_url, format_user, format_list, format_tag: generating the HTML
+      of an entity
+    - spans: converting positions to the span_unit
+
+    A single pass finds all three types, so scan also includes the searches
+    that found nothing, which belong to no type. Results from the result
+    cache are not parsed, so they count for none of the stages. A ParseStats
+    can be shared between Parsers and threads.
+
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, stage, seconds, entities):
+        '''Count a call of stage that took seconds and gave entities.'''
+        with self._lock:
+            totals = self._stages.get(stage)
+            if totals is None:
+                totals = self._stages[stage] = [0, 0.0, 0]
+
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += entities
+
+    def as_dict(self):
+        '''Return the calls, seconds and entities of each stage as dicts.'''
+        with self._lock:
+            return dict((stage, {'calls': calls, 'seconds': seconds,
+                                 'entities': entities})
+                        for stage, (calls, seconds, entities)
+                        in self._stages.items())
+
+    def reset(self):
+        '''Forget everything recorded so far.'''
+        with self._lock:
+            self._stages.clear()
+
+
+# Ends the iteration in _timed_iter
+_DONE = object()
+
+
+def _timed_iter(record, stage, iterable, by_kind=False):
+    '''Yield from iterable, recording the time spent in it as one call.
+
+    With by_kind, the time it took to get each item, a tuple starting with
+    its entity kind as from _entities, is also recorded under the stage and
+    the kind.
+
+    '''
+    seconds = 0.0
+    count = 0
+    iterator = iter(iterable)
+    try:
+        while True:
+            start = clock()
+            item = next(iterator, _DONE)
+            took = clock() - start
+            seconds += took
+            if item is _DONE:
+                return
+
+            if by_kind:
+                record('%s_%s' % (stage, item[0]), took, 1)
+
+            count += 1
+            yield item
+
+    finally:
+        record(stage, seconds, count)
 
 
 class Parser(object):
 
     '''A Tweet Parser'''
 
-    def __init__(self, max_url_length=30, include_spans=False):
+    def __init__(self, max_url_length=30, include_spans=False, cache_size=0,
+                 max_length=None, too_long='truncate', time_budget=None,
+                 span_unit='codepoint', templates=None, entities=None,
+                 stats=None, watchlist=None):
+        '''Create a Parser.
+
+        The HTML of each entity type comes from a template in templates, a
+        dict with the keys of TEMPLATE_FIELDS, or else from the format_*
+        method when a subclass overrides it, or else from DEFAULT_TEMPLATES.
+        Templates use str.format syntax with these fields:
+        - url: {url} (escaped), {text} (escaped and shortened)
+        - user: {at} (the @ sign), {user}
+        - list: {at}, {user}, {list_name}
+        - tag: {hash} (the # sign), {tag}, {quoted} (#tag quoted for URLs)
+
+        Only the ParseResult fields in entities, e.g. {'urls', 'tags'}, are
+        parsed for and formatted, the others stay empty. URLs are still
+        looked for, but only to leave out what is inside of them.
+
+        Entity positions count code points, or UTF-16 code units or UTF-8
+        bytes when span_unit is 'utf16' or 'utf8', to index into the
+        encoded text.
+
+        Texts longer than max_length characters are cut to max_length when
+        too_long is 'truncate', and make parse raise a ValueError when it is
+        'reject'. Parsing stops after time_budget seconds. Both give a
+        ParseResult with the partial flag set.
+
+        The calls, time and entities of each stage of parsing are recorded
+        with stats, a ParseStats, when it is given. Without it nothing is
+        timed.
+
+        Each entity found is looked up in watchlist, a watchlist.Watchlist,
+        and the IDs it matches are given as the watched field of the result.
+        Only the entity types in entities are looked up.
+
+        '''
+        if too_long not in ('truncate', 'reject'):
+            raise ValueError("too_long must be 'truncate' or 'reject'")
+
+        if span_unit not in SPAN_UNITS:
+            raise ValueError('span_unit must be one of %s'
+                             % ', '.join(sorted(SPAN_UNITS)))
+
+        templates = templates or {}
+        for kind in templates:
+            if kind not in TEMPLATE_FIELDS:
+                raise ValueError('Unknown template %r, use %s'
+                                 % (kind, ', '.join(sorted(TEMPLATE_FIELDS))))
+
+        if entities is None:
+            entities = RESULT_FIELDS
+
+        for field in entities:
+            if field not in RESULT_FIELDS:
+                raise ValueError('Unknown entity field %r, use %s'
+                                 % (field, ', '.join(sorted(RESULT_FIELDS))))
+
+        # The names of the entity types to find, as in ENTITY_TYPES, and
+        # the patterns for the combinations that _scan_types gives for them
+        self._wanted = frozenset(RESULT_FIELDS[field] for field in entities)
+        self._all_wanted = self._wanted.issuperset(ENTITY_TYPES)
+        if not self._all_wanted:
+            for types in (('user', 'list'), ('tag',)):
+                if self._wanted.intersection(types):
+                    _scanner(types)
+
         self._max_url_length = max_url_length
         self._include_spans = include_spans
+        self._max_length = max_length
+        self._reject_too_long = too_long == 'reject'
+        self._time_budget = time_budget
+        self._span_length = SPAN_UNITS[span_unit]
+        self._watchlist = watchlist
+
+        # None where an overridden format_* method has to be called instead
+        self._templates = {}
+        for kind, method in (('url', 'format_url'),
+                             ('user', 'format_username'),
+                             ('list', 'format_list'), ('tag', 'format_tag')):
+            if kind in templates:
+                template = templates[kind]
+            elif getattr(type(self), method) is not getattr(Parser, method):
+                template = None
+            else:
+                template = DEFAULT_TEMPLATES[kind]
+
+            self._templates[kind] = None if template is None \
+                else compile_template(kind, template)
+
+        # Results of recently parsed texts, keyed on the text and html flag;
+        # the other options are fixed for the lifetime of the Parser
+        self._cached_parse = None
+        if cache_size:
+            self._cached_parse = lru_cache(cache_size)(self._parse_cacheable)
+
+        if stats is not None:
+            self._instrument(stats.record)
 
     def parse(self, text, html=True):
         '''Parse the text and return a ParseResult instance.'''
-        self._urls = []
-        self._users = []
-        self._lists = []
-        self._tags = []
+        return self._parse(text, html)
+
+    def parse_many(self, texts, html=True, chunk_size=1000):
+        '''Parse an iterable of texts and yield a ParseResult for each.
+
+        The texts are read chunk_size at a time, so no more than one chunk of
+        texts and results is held in memory no matter how long the input is.
+
+        '''
+        texts = iter(texts)
+        parse = self._parse
+        while True:
+            results = [parse(text, html) for text in islice(texts, chunk_size)]
+            if not results:
+                return
+
+            for result in results:
+                yield result
+
+    def parse_lazy(self, text, html=True):
+        '''Return a LazyParseResult, which parses the text on access.
+
+        Only the attributes that are read are parsed for, which is cheaper
+        when only e.g. the hashtags are needed. The result cache is not used.
+
+        '''
+        text, too_long = self._truncate(text)
+        return LazyParseResult(self, text, html, self._include_spans,
+                               too_long)
+
+    def parse_incremental(self, text='', html=True):
+        '''Return an IncrementalParse of text, to be updated with its edits.
+
+        Only a window around each edit is parsed again, which keeps parsing
+        a text on every keystroke cheap however long the text gets. The
+        result cache is not used.
+
+        '''
+        return IncrementalParse(self, text, html)
+
+    def cache_stats(self):
+        '''Return the hits, misses and size of the result cache as a dict.'''
+        if self._cached_parse is None:
+            return None
+
+        info = self._cached_parse.cache_info()
+        return {'hits': info.hits, 'misses': info.misses,
+                'size': info.currsize, 'max_size': info.maxsize}
+
+    def _instrument(self, record):
+        '''Time the stages listed in STAGES with record, see ParseStats.
+
+        Timed versions of the methods behind the stages shadow them on this
+        instance, so a Parser without stats runs the plain ones.
+
+        '''
+        parse_fields, find_entities = self._parse_fields, self._find_entities
+        reply, find_urls = self._reply, self._find_urls
+        segment_entities, segment_tags = (self._segment_entities,
+                                          self._segment_tags)
+        format_entity, convert_spans = (self._format_entity,
+                                        self._convert_spans)
+
+        def _parse_fields(text, html):
+            start = clock()
+            fields = parse_fields(text, html)
+            record('parse', clock() - start, len(fields[0]))
+            return fields
+
+        def _find_entities(text, types):
+            start = clock()
+            entities, partial = find_entities(text, types)
+            record('parse', clock() - start, len(entities))
+            return entities, partial
+
+        def _reply(text):
+            start = clock()
+            user = reply(text)
+            record('reply', clock() - start, int(user is not None))
+            return user
+
+        def _find_urls(text, pos=0, endpos=None):
+            return _timed_iter(record, 'urls', find_urls(text, pos, endpos))
+
+        def _segment_entities(text, pos, end, context, scanner, last):
+            return _timed_iter(record, 'scan', segment_entities(
+                text, pos, end, context, scanner, last), True)
+
+        def _segment_tags(text, pos, end, context):
+            # The hashtags are not handed out one by one, so scan_tag gets
+            # the time of the whole segment
+            start = clock()
+            count = len(context.entities)
+            segment_tags(text, pos, end, context)
+            seconds = clock() - start
+            count = len(context.entities) - count
+            record('scan', seconds, count)
+            if count:
+                record('scan_tag', seconds, count)
+
+        def _format_entity(kind, args):
+            start = clock()
+            html = format_entity(kind, args)
+            record('format_' + kind, clock() - start, 1)
+            return html
+
+        def _convert_spans(text, entities, length):
+            start = clock()
+            entities = convert_spans(text, entities, length)
+            record('spans', clock() - start, len(entities))
+            return entities
+
+        self._parse_fields = _parse_fields
+        self._find_entities = _find_entities
+        self._reply = _reply
+        self._find_urls = _find_urls
+        self._segment_entities = _segment_entities
+        self._segment_tags = _segment_tags
+        self._format_entity = _format_entity
+        self._convert_spans = _convert_spans
+
+    def _parse(self, text, html):
+        '''Parse a Tweet, using the result cache if there is one.'''
+        if self._cached_parse is None:
+            fields = self._parse_fields(text, html)
+        else:
+            try:
+                fields = self._cached_parse(text, html)
+            except _PartialResult as partial:
+                fields = partial.fields
+
+        return ParseResult.from_entities(*fields)
+
+    def _parse_fields(self, text, html):
+        '''Parse a Tweet into the arguments for ParseResult.from_entities.'''
+        text, too_long = self._truncate(text)
+        context = _ParseContext(self._deadline())
+        reply = self._reply(text)
+        if html:
+            parsed_html = self._html(text, context)
+        else:
+            parsed_html = self._text(text, context)
+
+        entities = context.entities
+        if not self._all_wanted:
+            entities = [entity for entity in entities
+                        if ENTITY_NAMES[type(entity)] in self._wanted]
+
+        watched = self._watch(entities)
+        if self._span_length is not None:
+            entities = self._convert_spans(text, entities, self._span_length)
+
+        return (tuple(entities), reply, parsed_html, self._include_spans,
+                too_long or context.partial, watched)
+
+    def _find_entities(self, text, types):
+        '''Find the URLs and the entity types given as for _scanner.
+
+        Returns the records and whether parsing ran out of time.
+
+        '''
+        context = _ParseContext(self._deadline())
+        self._scan(text, context, types)
+        entities = context.entities
+        if self._span_length is not None:
+            entities = self._convert_spans(text, entities, self._span_length)
+
+        return entities, context.partial
+
+    def _watch(self, entities):
+        '''Return the IDs of the watchlist that entities match.'''
+        if self._watchlist is None:
+            return ()
+
+        return tuple(self._watchlist.match(entities))
+
+    def _truncate(self, text):
+        '''Apply max_length, return the text and whether it was too long.'''
+        too_long = self._max_length is not None \
+            and len(text) > self._max_length
+        if too_long:
+            if self._reject_too_long:
+                raise ValueError('Text is longer than %d characters'
+                                 % self._max_length)
+
+            text = text[:self._max_length]
+
+        return text, too_long
+
+    def _reply(self, text):
+        '''Return the username the Tweet replies to, if reply is wanted.'''
+        if 'reply' not in self._wanted:
+            return None
 
         reply = REPLY_REGEX.match(text)
-        reply = reply.groups(0)[0] if reply is not None else None
+        return reply.group(1) if reply is not None else None
+
+    def _deadline(self):
+        if self._time_budget is None:
+            return None
+
+        return clock() + self._time_budget
 
-        parsed_html = self._html(text) if html else self._text(text)
-        return ParseResult(self._urls, self._users, reply,
-                           self._lists, self._tags, parsed_html)
+    def _parse_cacheable(self, text, html):
+        '''Parse a Tweet for the result cache.'''
+        fields = self._parse_fields(text, html)
 
-    def _text(self, text):
+        # Running out of time depends on more than the text, so such results
+        # must not end up in the cache
+        if fields[4] and self._time_budget is not None:
+            raise _PartialResult(fields)
+
+        return fields
+
+    def _text(self, text, context):
         '''Parse a Tweet without generating HTML.'''
-        URL_REGEX.sub(self._parse_urls, text)
-        USERNAME_REGEX.sub(self._parse_users, text)
-        LIST_REGEX.sub(self._parse_lists, text)
-        HASHTAG_REGEX.sub(self._parse_tags, text)
+        types = ('user', 'list', 'tag') if self._all_wanted \
+            else _scan_types(text, self._wanted)
+        if types is not None:
+            self._scan(text, context, types)
+
         return None
 
-    def _html(self, text):
-        '''Parse a Tweet and generate HTML.'''
-        html = URL_REGEX.sub(self._parse_urls, text)
-        html = USERNAME_REGEX.sub(self._parse_users, html)
-        html = LIST_REGEX.sub(self._parse_lists, html)
-        return HASHTAG_REGEX.sub(self._parse_tags, html)
+    def _scan(self, text, context, types):
+        '''Find the URLs and the entity types given as for _scanner.'''
+        if types != ('tag',):
+            for entity in self._entities(text, context, _scanner(types)):
+                pass
+
+            return
+
+        for entity in self._entities(text, context, None):
+            pass
+
+        urls = context.entities
+        context.entities = []
+        pos = 0
+        for url in urls:
+            self._segment_tags(text, pos, url.start, context)
+            context.entities.append(url)
+            pos = url.end
+
+        self._segment_tags(text, pos, len(text), context)
+
+    def _html(self, text, context):
+        '''Parse a Tweet and generate HTML.
+
+        The formatted entities are spliced in between the untouched parts of
+        the text in a single pass, the text itself is never rewritten, so
+        entity positions always refer to the original text.
+
+        '''
+        scanner = _scanner(ENTITY_SCAN_TYPES)
+        if not self._all_wanted:
+            scanner = _scanner(_scan_types(text, self._wanted) or ())
+            if scanner is None and 'url' not in self._wanted:
+                return text
+
+        html = []
+        pos = 0
+        wanted = self._wanted
+        format_entity = self._format_entity
+        for kind, start, end, args in self._entities(text, context, scanner):
+            if kind in wanted:
+                html.append(text[pos:start])
+                html.append(format_entity(kind, args))
+                pos = end
+
+        html.append(text[pos:])
+        return ''.join(html)
+
+    def _format_entity(self, kind, args):
+        '''Return the HTML of an entity found by _entities.'''
+        template = self._templates[kind]
+        if kind == 'url':
+            full_url, text = args
+            url = escape(text)
+            if template is not None:
+                # full_url is either text or https:// and text, so it does not
+                # need escaping again
+                return template(url if full_url == text
+                                else 'https://' + url, self._shorten_url(url))
+
+            return self.format_url(full_url, self._shorten_url(url))
+
+        elif kind == 'tag':
+            if template is not None:
+                return template(args[0], args[1], quote_hashtag(args[1]))
+
+            return self.format_tag(*args)
+
+        elif template is not None:
+            return template(*args)
+
+        elif kind == 'user':
+            return self.format_username(*args)
+
+        return self.format_list(*args)
+
+    def _entities(self, text, context, scanner, pos=0, endpos=None):
+        '''Find all entities in one left-to-right walk over the Tweet.
+
+        Yields a (type, start, end, args) tuple for every entity, where args
+        are the arguments for the matching format_* method. URLs take
+        precedence over everything else, so the URL matches split the text
+        into segments which are then searched for users, lists and hashtags,
+        or only the types of the scanner (see _scanner). Stops early once the
+        context runs out of time.
+
+        Only the text from pos to endpos is walked, which gives the same
+        entities as walking all of it when both are boundaries as found by
+        IncrementalParse.
+
+        '''
+        endpos = len(text) if endpos is None else endpos
+        last = None
+        for match in self._find_urls(text, pos, endpos):
+            if context.out_of_time():
+                return
+
+            url = self._parse_urls(match)
+            if url is not None:
+                kind, start, end, (full_url, url_text) = url
+                if scanner is not None:
+                    for entity in self._segment_entities(text, pos, start,
+                                                         context, scanner,
+                                                         last):
+                        yield entity
+
+                if context.partial:
+                    return
+
+                context.entities.append(Url(url_text, start, end))
+                yield url
+                pos = end
+                last = 'url'
+
+        if scanner is not None and not context.partial:
+            for entity in self._segment_entities(text, pos, endpos, context,
+                                                 scanner, last):
+                yield entity
+
+    def _segment_entities(self, text, pos, end, context, scanner, last):
+        '''Find users, lists and hashtags between two URLs.
+
+        The old parser ran one pass per entity type and replaced the matches
+        of each pass with HTML before running the next one. An entity can
+        therefore directly follow one of an earlier pass (urls, users, lists,
+        hashtags) even if the character in front of it would otherwise rule
+        it out, but it can never directly follow one of the same type. last
+        is 'url' when the segment starts right after a URL.
+
+        '''
+        search, after = scanner
+        while pos < end and not context.out_of_time():
+            match = None
+            if last in after:
+                match = after[last].match(text, pos, end)
+
+            if match is None:
+                match = search.search(text, pos, end)
+                if match is None:
+                    break
+
+                if match.start() == pos and match.lastgroup == last:
+                    pos += 1
+                    last = None
+                    continue
+
+            last = match.lastgroup
+            if last == 'tag':
+                if match.start() and text[match.start() + 1] == '_':
+                    match = self._last_tag(text, match, end)
+
+                args = self._parse_tags(match, context)
+
+            elif last == 'user':
+                args = self._parse_users(match, context)
+
+            else:
+                args = self._parse_lists(match, context)
+
+            yield last, match.start(), match.end(), args
+
+            pos = match.end()
+
+    def _segment_tags(self, text, pos, end, context):
+        '''Find only the hashtags between two URLs.
+
+        The same as _segment_entities with the scanner for hashtags, without
+        the bookkeeping it needs for the other types. A hashtag can only
+        directly follow a URL, and never another hashtag.
+
+        '''
+        search, after = _scanner(('tag',))
+        search = search.search
+        out_of_time = context.out_of_time
+        if out_of_time():
+            return
+
+        match = after['url'].match(text, pos, end) if pos else None
+        if match is None:
+            match = search(text, pos, end)
+
+        while match is not None:
+            start = match.start()
+            if start and text[start + 1] == '_':
+                match = self._last_tag(text, match, end)
+                start = match.start()
+
+            pos = match.end()
+            context.entities.append(Hashtag(match.group('tag'), start, pos))
+            if out_of_time():
+                return
+
+            match = search(text, pos, end)
+            if match is not None and match.start() == pos:
+                match = search(text, pos + 1, end)
+
+    def _last_tag(self, text, match, end):
+        '''Find the hashtag HASHTAG_REGEX would have matched instead.
+
+        Underscores are valid in front of a hashtag, so for "-#_#tag" the
+        greedy prefix of HASHTAG_REGEX skipped "#_" in favor of "#tag". A
+        username of underscores, as in "-#_ @__ #tag", had already been
+        replaced with HTML by then, which ended the prefix, so the search
+        stops at the first user or list. Whatever ends in the prefix is
+        followed by a character of it, so the users and lists that matter
+        are found without looking past it.
+
+        '''
+        start = match.start()
+        run_end = HASHTAG_PRE_RUN_REGEX.match(text, start, end).end()
+        mention = _scanner(('user', 'list'))[0].search(text, match.end(),
+                                                       run_end)
+        pos = (mention.start() if mention is not None else run_end) - 1
+        while pos > start:
+            if text[pos] in '#\uff03':
+                tag = HASHTAG_AT_REGEX.match(text, pos, end)
+                if tag is not None:
+                    return tag
+
+            pos -= 1
+
+        return match
 
     # Internal parser stuff ----------------------------------------------------
+    # These are methods, so that stats can time them, see _instrument
+    _find_urls = staticmethod(_find_urls)
+    _convert_spans = staticmethod(_convert_spans)
+
     def _parse_urls(self, match):
         '''Parse URLs.'''
 
         mat = match.group(0)
 
-        # Fix a bug in the regex concerning www...com and www.-foo.com domains
-        # TODO fix this in the regex instead of working around it here
+        # URL_REGEX also matches www...com and www.-foo.com domains. They are
+        # dropped here rather than in the regex, because _find_urls has to
+        # yield the same matches as URL_REGEX.finditer, and a dropped match
+        # still consumes its text there
         domain = match.group(5)
         if domain[0] in '.-':
-            return mat
+            return None
 
         # Only allow IANA one letter domains that are actually registered
         if len(domain) == 5 \
            and domain[-4:].lower() in ('.com', '.org', '.net') \
            and not domain.lower() in IANA_ONE_LETTER_DOMAINS:
 
-            return mat
+            return None
 
         # Check for urls without http(s)
         pos = mat.find('http')
@@ -182,84 +1580,44 @@ class Parser(object):
             pre, url = mat[:pos], mat[pos:]
             full_url = 'https://%s' % url
 
-        if self._include_spans:
-            span = match.span(0)
-            # add an offset if pre is e.g. ' '
-            span = (span[0] + len(pre), span[1])
-            self._urls.append((url, span))
-        else:
-            self._urls.append(url)
-
-        if self._html:
-            return '%s%s' % (pre, self.format_url(full_url,
-                                                  self._shorten_url(escape(url))))
+        # skip the prefix if pre is e.g. ' '
+        start = match.start() + len(pre)
+        return 'url', start, match.end(), (full_url, url)
 
-    def _parse_users(self, match):
+    def _parse_users(self, match, context):
         '''Parse usernames.'''
 
-        # Don't parse lists here
-        if match.group(2) is not None:
-            return match.group(0)
+        user = match.group('user_name')
+        context.entities.append(Mention(user, match.start(), match.end()))
 
-        mat = match.group(0)
-        if self._include_spans:
-            self._users.append((mat[1:], match.span(0)))
-        else:
-            self._users.append(mat[1:])
-
-        if self._html:
-            return self.format_username(mat[0:1], mat[1:])
+        return match.group(0)[0:1], user
 
-    def _parse_lists(self, match):
+    def _parse_lists(self, match, context):
         '''Parse lists.'''
 
-        # Don't parse usernames here
-        if match.group(4) is None:
-            return match.group(0)
+        user, list_name = match.group('list_user'), match.group('list_name')[1:]
+        context.entities.append(ListMention(user, list_name, match.start(),
+                                            match.end()))
 
-        pre, at_char, user, list_name = match.groups()
-        list_name = list_name[1:]
-        if self._include_spans:
-            self._lists.append((user, list_name, match.span(0)))
-        else:
-            self._lists.append((user, list_name))
+        return match.group(0)[0:1] + match.group('list_at'), user, list_name
 
-        if self._html:
-            return '%s%s' % (pre, self.format_list(at_char, user, list_name))
-
-    def _parse_tags(self, match):
+    def _parse_tags(self, match, context):
         '''Parse hashtags.'''
 
-        mat = match.group(0)
+        text = match.group('tag')
+        context.entities.append(Hashtag(text, match.start(), match.end()))
 
-        # Fix problems with the regex capturing stuff infront of the #
-        tag = None
-        for i in '#\uff03':
-            pos = mat.rfind(i)
-            if pos != -1:
-                tag = i
-                break
-
-        pre, text = mat[:pos], mat[pos + 1:]
-        if self._include_spans:
-            span = match.span(0)
-            # add an offset if pre is e.g. ' '
-            span = (span[0] + len(pre), span[1])
-            self._tags.append((text, span))
-        else:
-            self._tags.append(text)
-
-        if self._html:
-            return '%s%s' % (pre, self.format_tag(tag, text))
+        return match.group(0)[0:1], text
 
     def _shorten_url(self, text):
         '''Shorten a URL and make sure to not cut of html entities.'''
 
         if len(text) > self._max_url_length and self._max_url_length != -1:
             text = text[0:self._max_url_length - 3]
-            amp = text.rfind('&')
-            close = text.rfind(';')
-            if amp != -1 and (close == -1 or close < amp):
+
+            # An entity cut in half starts in the last 5 characters
+            amp = text.rfind('&', max(len(text) - 5, 0))
+            if amp != -1 and text.find(';', amp) == -1:
                 text = text[0:amp]
 
             return text + '...'
@@ -271,7 +1629,7 @@ class Parser(object):
     def format_tag(self, tag, text):
         '''Return formatted HTML for a hashtag.'''
         return '<a href="https://twitter.com/hashtag/%s">%s%s</a>' \
-            % (quote(('#' + text).encode('utf-8')), tag, text)
+            % (quote_hashtag(text), tag, text)
 
     def format_username(self, at_char, user):
         '''Return formatted HTML for a username.'''
@@ -289,8 +1647,34 @@ class Parser(object):
 
 
 # Simple URL escaper
+ESCAPE_TABLE = {ord('&'): '&amp;', ord('"'): '&quot;', ord('\''): '&apos;',
+                ord('>'): '&gt;', ord('<'): '&lt;'}
+
+
 def escape(text):
     '''Escape some HTML entities.'''
-    return ''.join({'&': '&amp;', '"': '&quot;',
-                    '\'': '&apos;', '>': '&gt;',
-                    '<': '&lt;'}.get(c, c) for c in text)
+    return text.translate(ESCAPE_TABLE)
+
+
+# Popular hashtags are quoted over and over again
+@lru_cache(4096)
+def quote_hashtag(text):
+    '''Quote a hashtag for use in a URL.'''
+    return quote(('#' + text).encode('utf-8'))
+
+
+# Patterns ---------------------------------------------------------------------
+def compile_patterns():
+    '''Compile every pattern the parser can use now, not on first use.
+
+    Call this where the time does not count, e.g. while a server starts up,
+    to keep it out of the first parse. Called before worker processes are
+    forked, it also saves each of them from compiling the patterns again.
+
+    '''
+    for value in list(globals().values()):
+        if isinstance(value, _LazyPattern):
+            value.compile()
+
+    for types in (ENTITY_SCAN_TYPES, ('user', 'list'), ('tag',)):
+        _scanner(types)
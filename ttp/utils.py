@@ -2,28 +2,251 @@
 # -*- coding: utf-8 -*-
 """Unwind short-links e.g. bit.ly, t.co etc to their canonical links"""
 from __future__ import unicode_literals, print_function
-import requests
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
 
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:  # only follow_shortlinks needs it, not the caches
+    requests = None
+
+# Servers answering HEAD with one of these are asked again with GET
+HEAD_NOT_SUPPORTED = (405, 501)
+
+
+def follow_shortlinks(shortlinks, max_workers=10, max_per_host=4, timeout=10,
+                      max_redirects=10, session=None, cache=None):
+    """Follow redirects in list of shortlinks, return dict of resulting URLs
+
+    Up to max_workers links are followed at the same time over one pooled
+    requests.Session, but no more than max_per_host requests go to the same
+    host at once. Every hop is tried with a HEAD request first, only servers
+    that do not support HEAD are asked with GET. Links that fail, time out
+    after timeout seconds or redirect more than max_redirects times map to an
+    empty list.
+
+    Links without http(s)://, like the www. URLs the Parser finds, are
+    followed over https. Pass a LinkCache or SqliteLinkCache as cache to skip
+    the network for links that were followed before.
+    """
+    if requests is None:
+        raise ImportError('Following shortlinks needs requests')
 
-def follow_shortlinks(shortlinks):
-    """Follow redirects in list of shortlinks, return dict of resulting URLs"""
     links_followed = {}
+    to_follow = []
     for shortlink in shortlinks:
-        url = shortlink
-        request_result = requests.get(url)
-        redirect_history = request_result.history
-        # history might look like:
-        # (<Response [301]>, <Response [301]>)
-        # where each response object has a URL
-        all_urls = []
-        for redirect in redirect_history:
-            all_urls.append(redirect.url)
-        # append the final URL that we finish with
-        all_urls.append(request_result.url)
+        if shortlink in links_followed:
+            continue
+
+        all_urls = cache.get(shortlink) if cache is not None else None
         links_followed[shortlink] = all_urls
+        if all_urls is None:
+            to_follow.append(shortlink)
+
+    if not to_follow:
+        return links_followed
+
+    own_session = session is None
+    if own_session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers,
+                              pool_maxsize=max_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+    host_slots = _HostSlots(max_per_host)
+
+    def follow(shortlink):
+        try:
+            return _follow_shortlink(session, _with_scheme(shortlink),
+                                     timeout, max_redirects, host_slots)
+        except requests.RequestException:
+            return []
+
+    try:
+        with ThreadPoolExecutor(max_workers) as executor:
+            for shortlink, all_urls in zip(to_follow,
+                                           executor.map(follow, to_follow)):
+                links_followed[shortlink] = all_urls
+                if cache is not None:
+                    cache.set(shortlink, all_urls)
+
+    finally:
+        if own_session:
+            session.close()
+
     return links_followed
 
 
+def _with_scheme(url):
+    """Return url with https:// in front if it has no http(s)://"""
+    if url[:8].lower().startswith(('http://', 'https://')):
+        return url
+
+    return 'https://' + url
+
+
+def _follow_shortlink(session, url, timeout, max_redirects, host_slots):
+    """Follow the redirects of one shortlink, return all URLs on the way"""
+    all_urls = []
+    while len(all_urls) <= max_redirects:
+        with host_slots(url):
+            response = session.head(url, timeout=timeout,
+                                    allow_redirects=False)
+            if response.status_code in HEAD_NOT_SUPPORTED:
+                response = session.get(url, timeout=timeout,
+                                       allow_redirects=False, stream=True)
+                response.close()
+
+        all_urls.append(response.url)
+        if not response.is_redirect:
+            return all_urls
+
+        url = urljoin(response.url, response.headers['location'])
+
+    raise requests.TooManyRedirects('Exceeded %d redirects.' % max_redirects)
+
+
+class _HostSlots(object):
+    """Limit the number of concurrent requests per host"""
+
+    def __init__(self, max_per_host):
+        self._lock = threading.Lock()
+        self._slots = defaultdict(
+            lambda: threading.BoundedSemaphore(max_per_host))
+
+    def __call__(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            return self._slots[host]
+
+
+class LinkCache(object):
+    """In-memory LRU cache of followed shortlinks
+
+    Holds up to max_size links. Resolved links expire after ttl seconds,
+    links that could not be followed (an empty list of URLs) already after
+    negative_ttl seconds. The hits and misses attributes count lookups.
+    """
+
+    def __init__(self, max_size=10000, ttl=24 * 60 * 60, negative_ttl=5 * 60,
+                 clock=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._links = OrderedDict()
+
+    def get(self, shortlink):
+        """Return the cached list of URLs for shortlink, or None"""
+        with self._lock:
+            entry = self._load(shortlink)
+            if entry is not None and entry[1] > self._clock():
+                self.hits += 1
+                return entry[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, shortlink, all_urls):
+        """Cache the list of URLs a shortlink resolved to"""
+        ttl = self.ttl if all_urls else self.negative_ttl
+        with self._lock:
+            self._store(shortlink, all_urls, self._clock() + ttl)
+
+    def stats(self):
+        """Return the hit and miss counts and the current size as a dict"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self)}
+
+    def __len__(self):
+        return len(self._links)
+
+    # _load and _store are called with self._lock held
+
+    def _load(self, shortlink):
+        entry = self._links.get(shortlink)
+        if entry is not None:
+            self._links.move_to_end(shortlink)
+
+        return entry
+
+    def _store(self, shortlink, all_urls, expires):
+        self._links[shortlink] = (all_urls, expires)
+        self._links.move_to_end(shortlink)
+        while len(self._links) > self.max_size:
+            self._links.popitem(last=False)
+
+
+class SqliteLinkCache(LinkCache):
+    """LinkCache stored in a sqlite database, so it survives restarts"""
+
+    def __init__(self, path, max_size=1000000, ttl=24 * 60 * 60,
+                 negative_ttl=5 * 60, clock=time.time):
+        super(SqliteLinkCache, self).__init__(max_size, ttl, negative_ttl,
+                                              clock)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS links ('
+                             'shortlink TEXT PRIMARY KEY, all_urls TEXT, '
+                             'expires REAL, used INTEGER)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS links_used '
+                             'ON links (used)')
+
+        self._size, self._used = self._db.execute(
+            'SELECT COUNT(*), COALESCE(MAX(used), 0) FROM links').fetchone()
+
+    def close(self):
+        self._db.close()
+
+    def __len__(self):
+        return self._size
+
+    def _load(self, shortlink):
+        with self._db:
+            row = self._db.execute(
+                'SELECT all_urls, expires FROM links WHERE shortlink = ?',
+                (shortlink,)).fetchone()
+            if row is None:
+                return None
+
+            self._used += 1
+            self._db.execute('UPDATE links SET used = ? WHERE shortlink = ?',
+                             (self._used, shortlink))
+            return json.loads(row[0]), row[1]
+
+    def _store(self, shortlink, all_urls, expires):
+        with self._db:
+            self._used += 1
+            updated = self._db.execute(
+                'UPDATE links SET all_urls = ?, expires = ?, used = ? '
+                'WHERE shortlink = ?',
+                (json.dumps(all_urls), expires, self._used, shortlink))
+            if updated.rowcount:
+                return
+
+            self._db.execute('INSERT INTO links VALUES (?, ?, ?, ?)',
+                             (shortlink, json.dumps(all_urls), expires,
+                              self._used))
+            self._size += 1
+            if self._size > self.max_size:
+                self._db.execute(
+                    'DELETE FROM links WHERE shortlink IN (SELECT shortlink '
+                    'FROM links ORDER BY used LIMIT ?)',
+                    (self._size - self.max_size,))
+                self._size = self.max_size
+
+
 if __name__ == "__main__":
     shortlinks = ['http://t.co/8o0z9BbEMu', 'http://bbc.in/16dClPF']
     print(follow_shortlinks(shortlinks))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Match Tweets against watchlists of hashtags, usernames and domains
+
+    watchlist = Watchlist(tags={'python': 1}, users={'burnettedmond': 2},
+                          domains={'bbc.co.uk': 3})
+    parser = Parser(watchlist=watchlist, entities=watchlist.fields)
+    parser.parse(tweet).watched
+
+The watchlist is compiled once into hash tables keyed on the case-folded
+names, which the Parser looks up the entities it finds in, so matching takes
+the same time for a watchlist of ten names as for one of millions.
+"""
+from __future__ import unicode_literals, print_function
+import re
+
+try:
+    from .ttp import Url, Mention, ListMention, Hashtag
+except ImportError:  # imported from within ttp/, like tests.py does
+    from ttp import Url, Mention, ListMention, Hashtag
+
+# The host of a URL as found by the Parser, which only finds http(s):// and
+# www. URLs, after any user:password@
+HOST_REGEX = re.compile(r'(?:https?://)?(?:[^/?#]*@)?([^/?#:]*)',
+                        re.IGNORECASE)
+
+
+class Watchlist(object):
+    """Hashtags, usernames and domains to look for, each with an ID
+
+    Each of tags, users and domains maps the names to their IDs, or is an
+    iterable of names that are their own IDs. A leading # or @ is ignored.
+    Hashtags and usernames match regardless of case, as the Parser finds them
+    regardless of case; users also match the owner of a list. A domain
+    matches URLs on it and its subdomains, so bbc.co.uk matches
+    http://www.bbc.co.uk/news. Pass a Watchlist as watchlist to a Parser to
+    get the matched IDs as the watched field of its results.
+    """
+
+    __slots__ = ('_lookups', '_domains', 'fields')
+
+    def __init__(self, tags=None, users=None, domains=None):
+        tags = _compile(tags, '#＃')
+        users = _compile(users, '@＠')
+        self._domains = _compile(domains, '')
+        self._lookups = {Hashtag: tags, Mention: users, ListMention: users}
+
+        # The ParseResult fields a Parser has to find for this watchlist
+        self.fields = set()
+        for names, fields in ((tags, ('tags',)), (users, ('users', 'lists')),
+                              (self._domains, ('urls',))):
+            if names:
+                self.fields.update(fields)
+
+    def match(self, entities):
+        """Return the IDs matched by entities, in the order of the text.
+
+        entities are the records of a ParseResult, each ID is given once.
+        """
+        ids = {}
+        lookups = self._lookups
+        for entity in entities:
+            kind = type(entity)
+            if kind is Url:
+                if self._domains:
+                    for found in self._match_domain(entity[0]):
+                        for id in found:
+                            ids[id] = None
+
+                continue
+
+            found = lookups[kind].get(entity[0].lower())
+            if found is not None:
+                for id in found:
+                    ids[id] = None
+
+        return list(ids)
+
+    def _match_domain(self, url):
+        """Yield the IDs of the domains the host of url is on"""
+        domains = self._domains
+        host = HOST_REGEX.match(url).group(1).lower().rstrip('.')
+        while host:
+            found = domains.get(host)
+            if found is not None:
+                yield found
+
+            host = host.partition('.')[2]
+
+
+def _compile(names, signs):
+    """Return a dict from the folded names to a tuple of their IDs"""
+    compiled = {}
+    if not names:
+        return compiled
+
+    items = names.items() if hasattr(names, 'items') \
+        else ((name, name) for name in names)
+    for name, id in items:
+        if name[:1] and name[0] in signs:
+            name = name[1:]
+
+        key = name.lower().rstrip('.')
+        compiled[key] = compiled.get(key, ()) + (id,)
+
+    return compiled
+